@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, date
+
+from sqlalchemy import func, literal
+
+from config import Config
+from database import (engine, async_session, orders, applications, order_stats, orders_archive,
+                      applications_archive, select, delete, insert, text)
+
+
+logger = logging.getLogger(__name__)
+
+VIEWED_PARTITIONS_AHEAD_DAYS = 2
+
+
+async def archive_batch(batch_size: int = None) -> int:
+    """Переносит одну пачку старых заказов в архив. Возвращает число перенесенных заказов."""
+    batch_size = batch_size or Config.ORDER_ARCHIVE_BATCH
+    # К этому возрасту любой заказ уже истек (ORDER_LIFETIME_HOURS), открытым он в ленте не виден
+    threshold = datetime.now() - timedelta(days=Config.ORDER_ARCHIVE_AFTER_DAYS)
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(orders.c.order_id)
+            .where(orders.c.created_at < threshold)
+            .order_by(orders.c.order_id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        order_ids = [row[0] for row in result]
+        if not order_ids:
+            return 0
+
+        await session.execute(
+            insert(orders_archive).from_select(
+                ['order_id', 'employer_id', 'title', 'description', 'photo_id', 'status', 'created_at',
+                 'views', 'unique_viewers', 'applications', 'archived_at'],
+                select(orders.c.order_id, orders.c.employer_id, orders.c.title, orders.c.description,
+                       orders.c.photo_id, orders.c.status, orders.c.created_at,
+                       func.coalesce(order_stats.c.views, 0),
+                       func.coalesce(order_stats.c.unique_viewers, 0),
+                       func.coalesce(order_stats.c.applications, 0),
+                       literal(datetime.now()))
+                .outerjoin(order_stats, orders.c.order_id == order_stats.c.order_id)
+                .where(orders.c.order_id.in_(order_ids))
+            )
+        )
+        await session.execute(
+            insert(applications_archive).from_select(
+                ['application_id', 'order_id', 'worker_id', 'created_at', 'status'],
+                select(applications.c.application_id, applications.c.order_id, applications.c.worker_id,
+                       applications.c.created_at, applications.c.status)
+                .where(applications.c.order_id.in_(order_ids))
+            )
+        )
+        # Просмотры, отклики и статистика удаляются каскадом
+        await session.execute(delete(orders).where(orders.c.order_id.in_(order_ids)))
+        await session.commit()
+
+    return len(order_ids)
+
+async def archive_orders():
+    """Переносит в архив все старые заказы, пачка за пачкой."""
+    total = 0
+    while True:
+        moved = await archive_batch()
+        total += moved
+        if moved < Config.ORDER_ARCHIVE_BATCH:
+            break
+        # Не держим цикл событий и блокировки дольше одной пачки
+        await asyncio.sleep(0.1)
+    if total:
+        logger.info("В архив перенесено заказов: %s", total, extra={'category': 'archive'})
+    return total
+
+
+def _partition_name(day: date) -> str:
+    return f"viewed_orders_p{day:%Y%m%d}"
+
+async def ensure_viewed_partitions():
+    """Создает дневные секции viewed_orders на сегодня и вперед, удаляет ненужные ленте."""
+    today = date.today()
+    async with engine.begin() as conn:
+        is_partitioned = await conn.scalar(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+            "JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid "
+            "WHERE pg_class.relname = 'viewed_orders')"
+        ))
+        if not is_partitioned:
+            # create_all не переделывает существующую обычную таблицу в секционированную
+            logger.error("VIEWED_ORDERS_PARTITIONED включен, но viewed_orders в БД не секционирована. "
+                         "Пересоздайте таблицу как секционированную или выключите настройку; секции не создаются.")
+            return
+
+        for offset in range(VIEWED_PARTITIONS_AHEAD_DAYS + 1):
+            day = today + timedelta(days=offset)
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {_partition_name(day)} PARTITION OF viewed_orders "
+                f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+            ))
+
+        # Просмотр всегда позже создания заказа, поэтому просмотры старше срока жизни
+        # относятся только к истекшим заказам и ленте уже не нужны
+        oldest_needed = (datetime.now() - timedelta(hours=Config.ORDER_LIFETIME_HOURS)).date()
+        result = await conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'viewed_orders'"
+        ))
+        for (name,) in result:
+            try:
+                day = datetime.strptime(name.rsplit('_p', 1)[1], '%Y%m%d').date()
+            except (IndexError, ValueError):
+                continue
+            if day < oldest_needed:
+                await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                logger.info("Удалена секция %s", name, extra={'category': 'archive'})
+
+
+async def run_archiver():
+    """Фоновая задача: периодически архивирует заказы и обслуживает секции просмотров."""
+    while True:
+        try:
+            if Config.VIEWED_ORDERS_PARTITIONED:
+                await ensure_viewed_partitions()
+            await archive_orders()
+        except Exception as e:
+            logger.error("Ошибка архивации заказов: %s", e)
+        await asyncio.sleep(Config.ORDER_ARCHIVE_INTERVAL)
@@ -0,0 +1,4 @@
+"""Бенчмарки горячих запросов бота на синтетических данных разного масштаба.
+
+Запуск: python -m benchmarks.run --help
+"""
@@ -0,0 +1,171 @@
+"""Генератор синтетических users/orders/viewed_orders/applications с реалистичным перекосом."""
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+import asyncpg
+
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+# Доля строк каждой таблицы от общего масштаба (--scale)
+TABLE_SHARES = {
+    'users': 0.1,
+    'orders': 0.2,
+    'viewed_orders': 0.6,
+    'applications': 0.1,
+}
+COPY_CHUNK = 50_000
+HISTORY_DAYS = 180
+
+SPHERES = ['UI/UX дизайн', 'Backend разработчик на Python', 'Frontend React', 'SMM', 'Копирайтинг',
+           'Видеомонтаж', 'iOS разработка', 'Аналитика данных', 'Иллюстрация', 'DevOps', '3D-моделирование',
+           'Тестирование', 'Маркетинг', 'Перевод текстов', 'Motion-дизайн']
+BIO_WORDS = ['опыт', 'лет', 'проекты', 'Figma', 'Django', 'FastAPI', 'PostgreSQL', 'брендинг', 'лендинги',
+             'стартапы', 'фриланс', 'команда', 'продакшн', 'реклама', 'аналитика', 'Telegram', 'боты']
+
+
+def table_sizes(scale: int) -> Dict[str, int]:
+    return {table: max(1, int(scale * share)) for table, share in TABLE_SHARES.items()}
+
+def _skewed_index(rng: random.Random, n: int, skew: float = 3.0) -> int:
+    """Индекс от 0 до n-1, смещенный к началу: при skew=3 на первые 20% приходится ~60% выборок."""
+    return min(n - 1, int(n * rng.random() ** skew))
+
+def _recent_timestamp(rng: random.Random, now: datetime) -> datetime:
+    # Треть заказов и просмотров — за последние двое суток, остальное размазано по истории
+    if rng.random() < 0.33:
+        return now - timedelta(seconds=rng.uniform(0, Config.ORDER_LIFETIME_HOURS * 3600))
+    return now - timedelta(days=rng.uniform(0, HISTORY_DAYS))
+
+
+class SyntheticDataset:
+    """Детерминированный (по seed) набор данных заданного масштаба."""
+
+    def __init__(self, scale: int, seed: int = 42):
+        self.scale = scale
+        self.sizes = table_sizes(scale)
+        self.seed = seed
+        self.now = datetime.now()
+        users_count = self.sizes['users']
+        # Перемешанные id, чтобы "тяжелые" пользователи не шли подряд по индексу
+        rng = random.Random(seed)
+        self.employer_ids = rng.sample(range(1, users_count + 1), max(1, users_count // 5))
+        self.worker_ids = rng.sample(range(1, users_count + 1), max(1, users_count * 3 // 5))
+        self.order_created: List[datetime] = []
+
+    def users(self) -> Iterator[Tuple]:
+        rng = random.Random(self.seed + 1)
+        employers = set(self.employer_ids)
+        workers = set(self.worker_ids)
+        for user_id in range(1, self.sizes['users'] + 1):
+            if user_id in employers and user_id in workers:
+                role = 'both'
+            elif user_id in employers:
+                role = 'employer'
+            else:
+                role = 'worker'
+            yield (
+                user_id,
+                f"user{user_id}",
+                f"Пользователь {user_id}",
+                ' '.join(rng.choices(BIO_WORDS, k=rng.randint(5, 25))),
+                rng.choice(SPHERES),
+                None if rng.random() < 0.4 else f"https://example.com/{user_id}",
+                role,
+                rng.random() < 0.85,
+                self.now - timedelta(days=rng.uniform(0, HISTORY_DAYS * 2)),
+            )
+
+    def orders(self) -> Iterator[Tuple]:
+        rng = random.Random(self.seed + 2)
+        self.order_created = []
+        for order_id in range(1, self.sizes['orders'] + 1):
+            created_at = _recent_timestamp(rng, self.now)
+            self.order_created.append(created_at)
+            is_fresh = self.now - created_at < timedelta(hours=Config.ORDER_LIFETIME_HOURS)
+            status = 'open' if (is_fresh and rng.random() < 0.8) or rng.random() < 0.1 else 'closed'
+            yield (
+                order_id,
+                self.employer_ids[_skewed_index(rng, len(self.employer_ids))],
+                f"Заказ {order_id}: {rng.choice(SPHERES)}",
+                ' '.join(rng.choices(BIO_WORDS, k=rng.randint(10, 60))),
+                None,
+                status,
+                created_at,
+            )
+
+    def _order_activity(self, rng: random.Random, table: str) -> Iterator[Tuple]:
+        # Свежие заказы получают непропорционально много просмотров и откликов
+        fresh = [i for i, created in enumerate(self.order_created)
+                 if self.now - created < timedelta(hours=Config.ORDER_LIFETIME_HOURS)]
+        total = len(self.order_created)
+        for row_id in range(1, self.sizes[table] + 1):
+            if fresh and rng.random() < 0.7:
+                index = fresh[_skewed_index(rng, len(fresh))]
+            else:
+                index = rng.randrange(total)
+            created = self.order_created[index]
+            at = created + timedelta(seconds=rng.uniform(0, max(1.0, (self.now - created).total_seconds())))
+            worker_id = self.worker_ids[_skewed_index(rng, len(self.worker_ids), skew=2.0)]
+            yield row_id, index + 1, worker_id, at
+
+    def viewed_orders(self) -> Iterator[Tuple]:
+        rng = random.Random(self.seed + 3)
+        for row_id, order_id, viewer_id, viewed_at in self._order_activity(rng, 'viewed_orders'):
+            yield row_id, viewer_id, order_id, viewed_at
+
+    def applications(self) -> Iterator[Tuple]:
+        rng = random.Random(self.seed + 4)
+        for row_id, order_id, worker_id, created_at in self._order_activity(rng, 'applications'):
+            yield row_id, order_id, worker_id, created_at, 'pending'
+
+
+TABLE_COLUMNS = {
+    'users': ['user_id', 'username', 'full_name', 'bio', 'sphere', 'portfolio', 'role', 'is_active', 'created_at'],
+    'orders': ['order_id', 'employer_id', 'title', 'description', 'photo_id', 'status', 'created_at'],
+    'viewed_orders': ['id', 'viewer_id', 'order_id', 'viewed_at'],
+    'applications': ['application_id', 'order_id', 'worker_id', 'created_at', 'status'],
+}
+SERIAL_COLUMNS = {'orders': 'order_id', 'viewed_orders': 'id', 'applications': 'application_id'}
+
+
+async def _copy(conn: asyncpg.Connection, table: str, rows: Iterator[Tuple]):
+    chunk = []
+    loaded = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= COPY_CHUNK:
+            await conn.copy_records_to_table(table, records=chunk, columns=TABLE_COLUMNS[table])
+            loaded += len(chunk)
+            chunk = []
+    if chunk:
+        await conn.copy_records_to_table(table, records=chunk, columns=TABLE_COLUMNS[table])
+        loaded += len(chunk)
+    logger.info("%s: загружено %s строк", table, loaded)
+
+async def load(conn: asyncpg.Connection, dataset: SyntheticDataset):
+    """Очищает таблицы и заливает в них набор через COPY, затем пересчитывает order_stats и ANALYZE."""
+    await conn.execute("TRUNCATE users, orders, viewed_orders, applications, order_stats RESTART IDENTITY CASCADE")
+    # Порядок важен: внешние ключи ссылаются на users и orders
+    await _copy(conn, 'users', dataset.users())
+    await _copy(conn, 'orders', dataset.orders())
+    await _copy(conn, 'viewed_orders', dataset.viewed_orders())
+    await _copy(conn, 'applications', dataset.applications())
+
+    for table, column in SERIAL_COLUMNS.items():
+        await conn.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                           f"COALESCE((SELECT MAX({column}) FROM {table}), 1))")
+    await conn.execute(
+        "INSERT INTO order_stats (order_id, views, unique_viewers, applications, last_activity_at) "
+        "SELECT o.order_id, COALESCE(v.views, 0), COALESCE(v.unique_viewers, 0), COALESCE(a.applications, 0), "
+        "GREATEST(v.last_view, a.last_application) FROM orders o "
+        "LEFT JOIN (SELECT order_id, COUNT(*) AS views, COUNT(DISTINCT viewer_id) AS unique_viewers, "
+        "MAX(viewed_at) AS last_view FROM viewed_orders GROUP BY order_id) v ON v.order_id = o.order_id "
+        "LEFT JOIN (SELECT order_id, COUNT(*) AS applications, MAX(created_at) AS last_application "
+        "FROM applications GROUP BY order_id) a ON a.order_id = o.order_id"
+    )
+    await conn.execute("ANALYZE")
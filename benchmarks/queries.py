@@ -0,0 +1,40 @@
+"""Горячие запросы бота для замера.
+
+Запросы не копируются: бенчмарк берет те же построители из database.py, что и
+bot.py с order_feed.py, и лишь подставляет в них типичные параметры.
+"""
+from typing import Callable, Dict
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from database import (user_by_id_query, open_feed_orders_query, viewed_order_ids_query,
+                      employer_orders_query, order_by_id_query, worker_search_query)
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) поверх любого select."""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(Explain, 'postgresql')
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+HOT_QUERIES: Dict[str, Callable[[dict], object]] = {
+    # bot.get_user
+    'get_user': lambda params: user_by_id_query(params['user_id']),
+    # order_feed.OrderSnapshot.refresh
+    'feed_snapshot': lambda params: open_feed_orders_query(),
+    # order_feed.OrderSnapshot.get_seen
+    'feed_seen': lambda params: viewed_order_ids_query(params['user_id']),
+    # bot.handle_my_orders
+    'my_orders': lambda params: employer_orders_query(params['employer_id']),
+    # bot.apply_for_job, если заказа нет в снимке ленты
+    'apply_order_lookup': lambda params: order_by_id_query(params['order_id']),
+    # bot.search_workers, первая страница
+    'worker_search': lambda params: worker_search_query(params['search']),
+}
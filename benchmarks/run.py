@@ -0,0 +1,184 @@
+"""Замер горячих запросов бота на синтетических данных.
+
+Примеры:
+    # Залить 1M строк в отдельную тестовую БД и замерить
+    python -m benchmarks.run --db-url postgresql+asyncpg://bench@localhost/bench --scale 1000000 --generate
+
+    # Повторный прогон на тех же данных со сравнением с прошлым результатом
+    python -m benchmarks.run --db-url ... --baseline benchmarks/results/1000000.json
+
+Для каждого запроса пишутся p50/p95/среднее время, план EXPLAIN ANALYZE и флаги регрессий:
+последовательное сканирование больших таблиц, смена формы плана и рост p50 относительно базы.
+Код выхода 1, если найдена хотя бы одна регрессия.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config import Config
+from database import metadata
+from benchmarks.dataset import SyntheticDataset, load
+from benchmarks.queries import HOT_QUERIES, Explain
+
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+# Seq Scan по таблице меньше этого числа строк — нормальный выбор планировщика, а не регрессия
+SEQ_SCAN_MIN_ROWS = 10_000
+
+
+def plan_shape(node: dict) -> list:
+    """Форма плана без стоимостей и времени: тип узла, таблица, индекс и дочерние узлы."""
+    return [
+        node.get('Node Type'),
+        node.get('Relation Name'),
+        node.get('Index Name'),
+        [plan_shape(child) for child in node.get('Plans', [])],
+    ]
+
+def seq_scans(node: dict) -> List[dict]:
+    """Все узлы Seq Scan в плане."""
+    found = [node] if node.get('Node Type') == 'Seq Scan' else []
+    for child in node.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def pick_params(conn) -> dict:
+    """Выбирает типичные параметры: самого активного заказчика, исполнителя, свежий заказ."""
+    employer_id = await conn.scalar(text(
+        "SELECT employer_id FROM orders GROUP BY employer_id ORDER BY COUNT(*) DESC LIMIT 1"))
+    user_id = await conn.scalar(text(
+        "SELECT viewer_id FROM viewed_orders GROUP BY viewer_id ORDER BY COUNT(*) DESC LIMIT 1"))
+    order_id = await conn.scalar(text("SELECT MAX(order_id) FROM orders"))
+    return {
+        'employer_id': employer_id or 0,
+        'user_id': user_id or employer_id or 0,
+        'order_id': order_id or 0,
+        'search': 'Python',
+    }
+
+async def table_rows(conn) -> dict:
+    result = await conn.execute(text(
+        "SELECT relname, reltuples::bigint FROM pg_class "
+        "WHERE relname IN ('users', 'orders', 'viewed_orders', 'applications', 'order_stats')"))
+    return {name: rows for name, rows in result}
+
+async def measure(conn, name: str, params: dict, iterations: int, row_counts: dict) -> dict:
+    statement = HOT_QUERIES[name](params)
+    for _ in range(3):
+        await conn.execute(statement)
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = await conn.execute(statement)
+        result.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    raw_plan = (await conn.execute(Explain(statement))).scalar()
+    plan = (json.loads(raw_plan) if isinstance(raw_plan, str) else raw_plan)[0]
+    big_seq_scans = [node['Relation Name'] for node in seq_scans(plan['Plan'])
+                     if row_counts.get(node.get('Relation Name'), 0) >= SEQ_SCAN_MIN_ROWS]
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(statistics.quantiles(timings, n=20)[-1] if len(timings) >= 2 else timings[0], 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'plan_shape': plan_shape(plan['Plan']),
+        'seq_scans': big_seq_scans,
+        'plan': plan,
+    }
+
+def find_regressions(results: dict, baseline: Optional[dict], slowdown: float) -> List[str]:
+    regressions = []
+    for name, current in results['queries'].items():
+        for table in current['seq_scans']:
+            regressions.append(f"{name}: Seq Scan по {table}")
+        previous = (baseline or {}).get('queries', {}).get(name)
+        if not previous:
+            continue
+        if previous['plan_shape'] != current['plan_shape']:
+            regressions.append(f"{name}: план изменился")
+        if previous['p50_ms'] and current['p50_ms'] > previous['p50_ms'] * slowdown:
+            regressions.append(f"{name}: p50 {previous['p50_ms']} -> {current['p50_ms']} мс")
+    return regressions
+
+
+async def run(args) -> int:
+    engine = create_async_engine(args.db_url)
+    try:
+        if args.generate:
+            async with engine.begin() as conn:
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                await conn.run_sync(metadata.create_all)
+            dataset = SyntheticDataset(args.scale, seed=args.seed)
+            logger.info("Генерация набора: %s", dataset.sizes)
+            raw = await asyncpg.connect(args.db_url.replace('+asyncpg', ''))
+            try:
+                await load(raw, dataset)
+            finally:
+                await raw.close()
+
+        async with engine.connect() as conn:
+            row_counts = await table_rows(conn)
+            params = await pick_params(conn)
+            results = {'scale': args.scale, 'rows': row_counts, 'params': params, 'queries': {}}
+            for name in args.queries or HOT_QUERIES:
+                results['queries'][name] = await measure(conn, name, params, args.iterations, row_counts)
+                logger.info("%-20s p50=%8.3f мс  p95=%8.3f мс", name,
+                            results['queries'][name]['p50_ms'], results['queries'][name]['p95_ms'])
+    finally:
+        await engine.dispose()
+
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    regressions = find_regressions(results, baseline, args.slowdown)
+    results['regressions'] = regressions
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{args.scale}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2, default=str))
+    logger.info("Результаты сохранены в %s", output)
+
+    for regression in regressions:
+        logger.warning("РЕГРЕССИЯ: %s", regression)
+    return 1 if regressions else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк горячих запросов бота")
+    parser.add_argument('--db-url', default=os.getenv("BENCH_DB_URL"),
+                        help="БД для бенчмарка (по умолчанию BENCH_DB_URL). Данные в ней будут перезаписаны!")
+    parser.add_argument('--scale', type=int, default=100_000, help="Общее число строк набора (10k..10M)")
+    parser.add_argument('--generate', action='store_true', help="Сгенерировать и залить набор перед замером")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--queries', nargs='*', choices=list(HOT_QUERIES), help="Только эти запросы")
+    parser.add_argument('--baseline', help="JSON прошлого прогона для сравнения планов и времени")
+    parser.add_argument('--slowdown', type=float, default=1.5, help="Во сколько раз рост p50 считать регрессией")
+    parser.add_argument('--output', help="Куда сохранить результат (по умолчанию benchmarks/results/<scale>.json)")
+    args = parser.parse_args(argv)
+    if not args.db_url:
+        parser.error("укажите --db-url или BENCH_DB_URL")
+    if args.generate and args.db_url == Config.DB_URL:
+        parser.error("--generate перезаписывает данные: не запускайте его на рабочей БД (DB_URL)")
+    return args
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(run(parse_args(argv))))
+
+
+if __name__ == '__main__':
+    main()
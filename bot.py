@@ -1,30 +1,49 @@
+import html
 import logging
 import asyncio
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from datetime import datetime
 
 from aiogram import Bot, Dispatcher, types, F
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
-from aiogram.filters import CommandStart
+from aiogram.filters import CommandStart, Command, CommandObject
+from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError, TelegramServerError
 
 
 from config import Config
 import keyboards as kb
 import google_sheets as gs
-from database import (async_session, create_tables, users, orders, applications, viewed_orders,
+from circuit_breaker import CircuitBreaker, CircuitOpenError, breakers, CLOSED, OPEN
+import order_stats
+from archive import run_archiver
+import broadcast
+from order_feed import snapshot as order_feed, run_refresher as run_order_feed_refresher
+from log_setup import setup_logging, LoggingMiddleware
+from database import (async_session, read_session, mark_write, monitor_replicas, create_tables,
+                        users, orders, applications, viewed_orders, orders_archive, order_viewers,
+                        user_by_id_query, employer_orders_query, order_by_id_query, worker_search_query,
                         select, update, delete, and_, insert)
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
 storage = MemoryStorage()
 bot = Bot(token=Config.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 dp = Dispatcher(storage=storage)
+dp.message.middleware(LoggingMiddleware())
+dp.callback_query.middleware(LoggingMiddleware())
+
+# Ошибки клиента (например, битая разметка в тексте пользователя) — не отказ Telegram
+group_breaker = CircuitBreaker("Публикация в группу", failure_types=(TelegramNetworkError, TelegramServerError))
+# имя предохранителя -> [момент последнего алерта, сколько похожих ошибок с тех пор подавлено]
+alert_windows: dict = {}
 
 
 
@@ -45,14 +64,39 @@ class ProfileEditing(StatesGroup):
     field = State()
     new_value = State()
 
+class WorkerSearch(StatesGroup):
+    query = State()
+    results = State()
+
 
 
 async def get_user(user_id: int):
-    """Получает пользователя из БД."""
-    async with async_session() as session:
-        result = await session.execute(select(users).where(users.c.user_id == user_id))
+    """Получает пользователя из БД (с реплики, если он недавно ничего не менял)."""
+    async with read_session(user_id) as session:
+        result = await session.execute(user_by_id_query(user_id))
         return result.fetchone()
 
+# (запрос, после какого user_id) -> (момент записи, страница результатов)
+worker_search_cache: OrderedDict = OrderedDict()
+
+async def search_workers(query_text: str, after_id: int = 0):
+    """Ищет видимых исполнителей по сфере и описанию. Возвращает страницу и признак продолжения."""
+    key = (query_text.lower(), after_id)
+    cached = worker_search_cache.get(key)
+    if cached and time.monotonic() - cached[0] < Config.WORKER_SEARCH_CACHE_TTL:
+        worker_search_cache.move_to_end(key)
+        return cached[1]
+
+    async with read_session() as session:
+        result = await session.execute(worker_search_query(query_text, after_id))
+        rows = result.fetchall()
+
+    page = (rows[:Config.WORKER_SEARCH_PAGE_SIZE], len(rows) > Config.WORKER_SEARCH_PAGE_SIZE)
+    worker_search_cache[key] = (time.monotonic(), page)
+    if len(worker_search_cache) > Config.WORKER_SEARCH_CACHE_SIZE:
+        worker_search_cache.popitem(last=False)
+    return page
+
 def format_user_profile(user_data) -> str:
     """Форматирует профиль пользователя в красивый текст."""
     role_map = {
@@ -61,10 +105,10 @@ def format_user_profile(user_data) -> str:
         'both': 'Исполнитель и Заказчик'
     }
     return (
-        f"<b>👤 Имя:</b> {user_data.full_name}\n"
-        f"<b>🛠️ Сфера:</b> {user_data.sphere}\n"
-        f"<b>📝 О себе:</b> {user_data.bio}\n"
-        f"<b>🔗 Портфолио:</b> {user_data.portfolio or '—'}\n"
+        f"<b>👤 Имя:</b> {html.escape(user_data.full_name)}\n"
+        f"<b>🛠️ Сфера:</b> {html.escape(user_data.sphere)}\n"
+        f"<b>📝 О себе:</b> {html.escape(user_data.bio)}\n"
+        f"<b>🔗 Портфолио:</b> {html.escape(user_data.portfolio or '—')}\n"
         f"<b>🎯 Роль:</b> {role_map.get(user_data.role, 'Не указана')}\n"
         f"<b>✈️ TG:</b> @{user_data.username}"
     )
@@ -77,14 +121,93 @@ async def on_user_joined(message: types.Message):
     for user in message.new_chat_members:
         if not user.is_bot:
             await message.answer(
-                f"👋 Добро пожаловать в наше комьюнити, {user.full_name}!\n\n"
+                f"👋 Добро пожаловать в наше комьюнити, {html.escape(user.full_name)}!\n\n"
                 f"Чтобы получить доступ ко всем возможностям (создание заказов, поиск работы), "
                 f"нажми на мое имя и запусти меня в личных сообщениях командой /start"
                 f"Создано @velja297"
             )
-            logger.info(f"Приветствие для нового пользователя {user.id} в группе {message.chat.id}")
+            logger.info("Приветствие для нового пользователя %s в группе %s", user.id, message.chat.id,
+                        extra={'category': 'group'})
+
+
+
+async def alert_admin(breaker: CircuitBreaker, error: Exception, text: str):
+    """Сообщает админу об ошибке внешнего сервиса без шторма одинаковых алертов."""
+    if not Config.ADMIN_ID:
+        return
+    if isinstance(error, CircuitOpenError) or breaker.state != CLOSED:
+        # Об инциденте уже сообщили при размыкании, сводка придет при восстановлении
+        return
+
+    now = time.monotonic()
+    window = alert_windows.get(breaker.name)
+    if window and now - window[0] < Config.ALERT_DEDUP_SECONDS:
+        window[1] += 1
+        return
+    suppressed = window[1] if window else 0
+    alert_windows[breaker.name] = [now, 0]
+    if suppressed:
+        text += f"\n\n(и еще {suppressed} похожих ошибок с прошлого уведомления)"
+    try:
+        # Текст ошибки может содержать '<' и '&', поэтому без HTML-разметки
+        await bot.send_message(Config.ADMIN_ID, text, parse_mode=None)
+    except Exception as e:
+        logger.error("Не удалось отправить алерт админу: %s", e)
+
+async def on_breaker_state_change(breaker: CircuitBreaker, old_state: str, new_state: str):
+    """Одно уведомление на начало инцидента и одна сводка на его конец."""
+    if not Config.ADMIN_ID:
+        return
+    if old_state == CLOSED and new_state == OPEN:
+        text = (f"🔴 <b>{breaker.name}</b> отключен: слишком много ошибок. "
+                f"Вызовы отклоняются, повторная проверка через {int(breaker.open_seconds)} с.\n\n{breaker.describe()}")
+    elif new_state == CLOSED:
+        window = alert_windows.pop(breaker.name, None)
+        suppressed = window[1] if window else 0
+        text = (f"🟢 <b>{breaker.name}</b> снова работает.\n"
+                f"За время инцидента отклонено вызовов: {breaker.rejected}, подавлено алертов: {suppressed}.")
+    else:
+        return
+    try:
+        await bot.send_message(Config.ADMIN_ID, text)
+    except Exception as e:
+        logger.error("Не удалось отправить алерт админу: %s", e)
+
+for _breaker in breakers:
+    _breaker.add_listener(on_breaker_state_change)
+
+
+@dp.message(Command("status"), F.from_user.id == Config.ADMIN_ID)
+async def handle_status(message: types.Message):
+    """Показывает админу состояние внешних сервисов."""
+    await message.answer("<b>Внешние сервисы:</b>\n\n" + "\n\n".join(b.describe() for b in breakers))
 
 
+@dp.message(Command("broadcast"), F.from_user.id == Config.ADMIN_ID)
+async def handle_broadcast(message: types.Message, command: CommandObject):
+    """Запускает рассылку всем зарегистрированным пользователям: /broadcast текст"""
+    if not command.args:
+        await message.answer("Использование: /broadcast текст сообщения\nОстановить: /broadcast_stop номер")
+        return
+    try:
+        broadcast_id = await broadcast.start_broadcast(bot, command.args)
+    except TelegramBadRequest as e:
+        await message.answer(f"Telegram не принял текст рассылки, она не запущена. Проверьте HTML-разметку.\n\n{html.escape(str(e))}")
+        return
+    await message.answer(f"📣 Рассылка #{broadcast_id} запущена. Остановить: /broadcast_stop {broadcast_id}")
+
+@dp.message(Command("broadcast_stop"), F.from_user.id == Config.ADMIN_ID)
+async def handle_broadcast_stop(message: types.Message, command: CommandObject):
+    """Останавливает рассылку: /broadcast_stop номер"""
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Использование: /broadcast_stop номер")
+        return
+    broadcast_id = int(command.args)
+    if await broadcast.cancel_broadcast(broadcast_id):
+        await message.answer(f"Рассылка #{broadcast_id} остановлена.")
+    else:
+        await message.answer(f"Активной рассылки #{broadcast_id} нет.")
+
 
 @dp.message(CommandStart())
 async def handle_start(message: types.Message, state: FSMContext):
@@ -166,8 +289,9 @@ async def process_final_registration(message: types.Message, state: FSMContext):
         stmt = insert(users).values(db_data)
         await session.execute(stmt)
         await session.commit()
+    mark_write(user_id)
     
-    logger.info(f"Пользователь {user_id} успешно зарегистрирован в БД.")
+    logger.info("Пользователь %s успешно зарегистрирован в БД.", user_id, extra={'category': 'registration'})
     await message.answer(
         "✅ Ваш профиль успешно создан! Добро пожаловать!",
         reply_markup=kb.get_main_menu_keyboard()
@@ -177,9 +301,8 @@ async def process_final_registration(message: types.Message, state: FSMContext):
     try:
         await gs.add_user_to_sheet(db_data)
     except Exception as e:
-        logger.error(f"GSHEETS ОШИБКА (add_user): {e}")
-        if Config.ADMIN_ID:
-            await bot.send_message(Config.ADMIN_ID, f"⚠️ Не удалось добавить пользователя в Google Sheets.\n\nПользователь: {user_id}\nОшибка: {e}")
+        logger.error("GSHEETS ОШИБКА (add_user): %s", e)
+        await alert_admin(gs.sheets_breaker, e, f"⚠️ Не удалось добавить пользователя в Google Sheets.\n\nПользователь: {user_id}\nОшибка: {e}")
 
     # Публикация в группу
     if message.text == "Да, опубликовать":
@@ -187,16 +310,16 @@ async def process_final_registration(message: types.Message, state: FSMContext):
             try:
                 new_user_profile = await get_user(user_id)
                 profile_text = format_user_profile(new_user_profile)
-                await bot.send_message( 
+                await group_breaker.call(
+                    bot.send_message,
                     Config.NETWORKING_GROUP_ID,
                     f"👋 Встречайте нового участника!\n\n{profile_text}",
                     message_thread_id=Config.NETWORKING_TOPIC_ID    
                 )
-                logger.info(f"Анкета пользователя {user_id} опубликована в группе.")
+                logger.info("Анкета пользователя %s опубликована в группе.", user_id, extra={'category': 'group'})
             except Exception as e:
-                logger.error(f"GROUP POST ОШИБКА (анкета): {e}")
-                if Config.ADMIN_ID:
-                    await bot.send_message(Config.ADMIN_ID, f"⚠️ Не удалось опубликовать анкету в группу.\n\nПользователь: {user_id}\nОшибка: {e}")
+                logger.error("GROUP POST ОШИБКА (анкета): %s", e)
+                await alert_admin(group_breaker, e, f"⚠️ Не удалось опубликовать анкету в группу.\n\nПользователь: {user_id}\nОшибка: {e}")
         else:
             logger.warning("NETWORKING_GROUP_ID не указан в конфиге.")
 
@@ -224,39 +347,39 @@ async def process_order_photo(message: types.Message, state: FSMContext):
         result = await session.execute(insert(orders).values(db_data).returning(orders.c.order_id))
         order_id = result.scalar_one()
         await session.commit()
+    mark_write(message.from_user.id)
+    await order_feed.load_order(order_id)
 
-    logger.info(f"Заказ {order_id} от пользователя {message.from_user.id} создан.")
-    await message.answer(f"✅ Заказ «{order_data['title']}» успешно создан!", reply_markup=kb.get_main_menu_keyboard())
+    logger.info("Заказ %s от пользователя %s создан.", order_id, message.from_user.id, extra={'category': 'orders'})
+    await message.answer(f"✅ Заказ «{html.escape(order_data['title'])}» успешно создан!", reply_markup=kb.get_main_menu_keyboard())
 
 
     db_data['order_id'] = order_id
     try:
         await gs.add_order_to_sheet(db_data, employer.username)
     except Exception as e:
-        logger.error(f"GSHEETS ОШИБКА (add_order): {e}")
-        if Config.ADMIN_ID:
-            await bot.send_message(Config.ADMIN_ID, f"⚠️ Не удалось добавить заказ в Google Sheets.\n\nЗаказ: {order_id}\nОшибка: {e}")
+        logger.error("GSHEETS ОШИБКА (add_order): %s", e)
+        await alert_admin(gs.sheets_breaker, e, f"⚠️ Не удалось добавить заказ в Google Sheets.\n\nЗаказ: {order_id}\nОшибка: {e}")
 
 
     if Config.NETWORKING_GROUP_ID:
         try:
             order_text = (
-                f"<b>🔥 Новый заказ: {db_data['title']}</b>\n\n"
-                f"<b>📝 Описание:</b>\n{db_data['description']}\n\n"
-                f"<b>Заказчик:</b> {employer.full_name} (@{employer.username})\n\n"
+                f"<b>🔥 Новый заказ: {html.escape(db_data['title'])}</b>\n\n"
+                f"<b>📝 Описание:</b>\n{html.escape(db_data['description'])}\n\n"
+                f"<b>Заказчик:</b> {html.escape(employer.full_name)} (@{employer.username})\n\n"
                 f"<i>Откликнуться на заказ можно через бота в разделе 'Найти работу'.</i>"
             )
             if photo_id:
-                await bot.send_photo(Config.NETWORKING_GROUP_ID, photo_id, caption=order_text,
-                                     message_thread_id=Config.ORDERS_TOPIC_ID)
+                await group_breaker.call(bot.send_photo, Config.NETWORKING_GROUP_ID, photo_id, caption=order_text,
+                                         message_thread_id=Config.ORDERS_TOPIC_ID)
             else:
-                await bot.send_message(Config.NETWORKING_GROUP_ID, order_text,
-                                       message_thread_id=Config.ORDERS_TOPIC_ID)
-            logger.info(f"Заказ {order_id} опубликован в группе.")
+                await group_breaker.call(bot.send_message, Config.NETWORKING_GROUP_ID, order_text,
+                                         message_thread_id=Config.ORDERS_TOPIC_ID)
+            logger.info("Заказ %s опубликован в группе.", order_id, extra={'category': 'group'})
         except Exception as e:
-            logger.error(f"GROUP POST ОШИБКА (заказ): {e}")
-            if Config.ADMIN_ID:
-                await bot.send_message(Config.ADMIN_ID, f"⚠️ Не удалось опубликовать заказ в группу.\n\nЗаказ: {order_id}\nОшибка: {e}")
+            logger.error("GROUP POST ОШИБКА (заказ): %s", e)
+            await alert_admin(group_breaker, e, f"⚠️ Не удалось опубликовать заказ в группу.\n\nЗаказ: {order_id}\nОшибка: {e}")
     else:
         logger.warning("NETWORKING_GROUP_ID не указан в конфиге для публикации заказа.")
 
@@ -297,29 +420,77 @@ async def handle_find_job(message: types.Message, state: FSMContext):
 
 @dp.message(F.text == "📦 Мои заказы")
 async def handle_my_orders(message: types.Message):
-    async with async_session() as session:
-        result = await session.execute(
-            select(orders)
-            .where(orders.c.employer_id == message.from_user.id)
-            .order_by(orders.c.created_at.desc())
-        )
+    async with read_session(message.from_user.id) as session:
+        result = await session.execute(employer_orders_query(message.from_user.id))
         user_orders = result.fetchall()
+        archived = await session.execute(
+            select(orders_archive.c.order_id).where(orders_archive.c.employer_id == message.from_user.id).limit(1)
+        )
+        has_archive = archived.first() is not None
 
     if not user_orders:
         await message.answer("У вас пока нет созданных заказов. Хотите создать первый?", reply_markup=kb.get_main_menu_keyboard())
+        if has_archive:
+            await message.answer("Старые заказы лежат в архиве.", reply_markup=kb.get_archive_keyboard(0))
         return
 
     await message.answer("<b>Ваши созданные заказы:</b>")
     for order in user_orders:
         status_icon = "🟢 (Открыт)" if order.status == 'open' else "🔒 (Закрыт)"
+        pending = order_stats.pending_for(order.order_id)
+        views = (order.views or 0) + pending['views']
+        unique_viewers = (order.unique_viewers or 0) + pending['unique_viewers']
+        applied = (order.applications or 0) + pending['applications']
+        last_activity = pending['last_activity_at'] or order.last_activity_at
         text = (
-            f"<b>Заказ #{order.order_id}: {order.title}</b>\n"
+            f"<b>Заказ #{order.order_id}: {html.escape(order.title)}</b>\n"
             f"Статус: {status_icon}\n"
+            f"👀 Просмотры: {views} (уникальных: {unique_viewers}) · ✉️ Отклики: {applied}\n"
+            f"Последняя активность: {last_activity.strftime('%d.%m %H:%M') if last_activity else '—'}\n"
             f"<i>Описание:</i> {order.description[:100]}..."
         )
         is_closed = order.status == 'closed'
         await message.answer(text, reply_markup=kb.get_order_management_keyboard(order.order_id, is_closed))
 
+    if has_archive:
+        await message.answer("Старые заказы лежат в архиве.", reply_markup=kb.get_archive_keyboard(0))
+
+@dp.callback_query(F.data.startswith('orders_archive_'))
+async def handle_orders_archive(call: types.CallbackQuery):
+    """Показывает страницу архивных заказов (от новых к старым)."""
+    before_id = int(call.data.split('_')[2])
+    conditions = [orders_archive.c.employer_id == call.from_user.id]
+    if before_id:
+        conditions.append(orders_archive.c.order_id < before_id)
+
+    async with read_session() as session:
+        result = await session.execute(
+            select(orders_archive)
+            .where(and_(*conditions))
+            .order_by(orders_archive.c.order_id.desc())
+            .limit(Config.ORDER_ARCHIVE_PAGE_SIZE + 1)
+        )
+        archived_orders = result.fetchall()
+
+    await call.message.delete()
+    has_more = len(archived_orders) > Config.ORDER_ARCHIVE_PAGE_SIZE
+    archived_orders = archived_orders[:Config.ORDER_ARCHIVE_PAGE_SIZE]
+    if not archived_orders:
+        await call.message.answer("В архиве больше нет заказов.")
+        await call.answer()
+        return
+
+    for order in archived_orders:
+        await call.message.answer(
+            f"<b>🗄 Заказ #{order.order_id}: {html.escape(order.title)}</b>\n"
+            f"Создан: {order.created_at.strftime('%d.%m.%Y')}\n"
+            f"👀 Просмотры: {order.views} (уникальных: {order.unique_viewers}) · ✉️ Отклики: {order.applications}\n"
+            f"<i>Описание:</i> {order.description[:100]}..."
+        )
+    if has_more:
+        await call.message.answer("Показать более старые?", reply_markup=kb.get_archive_keyboard(archived_orders[-1].order_id))
+    await call.answer()
+
 
 @dp.message(F.text == "➕ Создать заказ")
 async def handle_create_order(message: types.Message, state: FSMContext):
@@ -349,47 +520,93 @@ async def process_order_description(message: types.Message, state: FSMContext):
 
 
 
+@dp.message(F.text == "🔎 Найти исполнителя")
+async def handle_find_worker(message: types.Message, state: FSMContext):
+    user = await get_user(message.from_user.id)
+    if not user:
+        await message.answer("Сначала нужно зарегистрироваться. Нажмите /start.")
+        return
+    if user.role not in ['employer', 'both']:
+        await message.answer("Ваша роль 'Исполнитель' не позволяет искать исполнителей. Вы можете изменить ее в профиле.")
+        return
+
+    await state.set_state(WorkerSearch.query)
+    await message.answer("Кого ищем? Введите сферу или ключевые слова (например, 'дизайн' или 'Python').",
+                         reply_markup=types.ReplyKeyboardRemove())
+
+@dp.message(WorkerSearch.query)
+async def process_worker_query(message: types.Message, state: FSMContext):
+    query_text = (message.text or '').strip()
+    if len(query_text) < 3:
+        await message.answer("Запрос слишком короткий, введите хотя бы 3 символа.")
+        return
+
+    await state.set_state(WorkerSearch.results)
+    await state.update_data(worker_query=query_text, worker_after_id=0)
+    await show_worker_page(message, state)
+
+async def show_worker_page(message: types.Message, state: FSMContext):
+    """Показывает следующую страницу найденных исполнителей."""
+    data = await state.get_data()
+    workers, has_more = await search_workers(data['worker_query'], data['worker_after_id'])
+
+    if not workers:
+        await state.clear()
+        text = "Больше никого не нашлось." if data['worker_after_id'] else "По вашему запросу никого не нашлось."
+        await message.answer(text, reply_markup=kb.get_main_menu_keyboard())
+        return
+
+    for worker in workers:
+        await message.answer(format_user_profile(worker))
+    await state.update_data(worker_after_id=workers[-1].user_id)
+    await message.answer("Показать еще?" if has_more else "Это все найденные исполнители.",
+                         reply_markup=kb.get_worker_search_keyboard(has_more))
+
+@dp.callback_query(WorkerSearch.results, F.data == 'workers_next')
+async def next_worker_page(call: types.CallbackQuery, state: FSMContext):
+    await call.message.delete()
+    await show_worker_page(call.message, state)
+    await call.answer()
+
+@dp.callback_query(F.data == 'stop_worker_search')
+async def stop_worker_search(call: types.CallbackQuery, state: FSMContext):
+    await state.clear()
+    await call.message.delete()
+    await call.message.answer("Поиск завершен.", reply_markup=kb.get_main_menu_keyboard())
+    await call.answer()
+
+
+
 async def show_next_order(message_or_call: types.Message | types.CallbackQuery, state: FSMContext):
     """Показывает следующий доступный заказ."""
     user_id = message_or_call.from_user.id
     message = message_or_call if isinstance(message_or_call, types.Message) else message_or_call.message
 
-    async with async_session() as session:
-     
-        viewed_result = await session.execute(
-            select(viewed_orders.c.order_id).where(viewed_orders.c.viewer_id == user_id)
-        )
-        viewed_ids = [row[0] for row in viewed_result]
-      
-        time_limit = datetime.now() - timedelta(hours=Config.ORDER_LIFETIME_HOURS)
-        query = (
-            select(orders, users.c.full_name, users.c.username)
-            .join(users, orders.c.employer_id == users.c.user_id)
-            .where(
-                and_(
-                    orders.c.status == 'open',
-                    orders.c.employer_id != user_id,
-                    orders.c.created_at >= time_limit,
-                    orders.c.order_id.notin_(viewed_ids)
-                )
-            )
-            .order_by(orders.c.created_at.desc())
-            .limit(1)
-        )
-        result = await session.execute(query)
-        order = result.fetchone()
+    # Заказы берем из снимка в памяти; в БД пишется только сам просмотр
+    seen = await order_feed.get_seen(user_id)
+    order = order_feed.next_for(user_id, seen)
 
     if order:
         await state.update_data(current_order_id=order.order_id)
-      
+        seen.add(order.order_id)
+
         async with async_session() as session:
             await session.execute(insert(viewed_orders).values(viewer_id=user_id, order_id=order.order_id))
+            # Уникальный просмотр — только если пары (заказ, зритель) еще не было
+            first_view = await session.execute(
+                pg_insert(order_viewers).values(order_id=order.order_id, viewer_id=user_id)
+                .on_conflict_do_nothing()
+                .returning(order_viewers.c.order_id)
+            )
+            is_unique = first_view.first() is not None
             await session.commit()
+        order_stats.record_view(order.order_id, unique=is_unique)
+        logger.info("Пользователю %s показан заказ %s", user_id, order.order_id, extra={'category': 'feed'})
         
         text = (
-            f"<b>Заказ: {order.title}</b>\n\n"
-            f"<b>Описание:</b>\n{order.description}\n\n"
-            f"<b>Заказчик:</b> {order.full_name} (@{order.username})"
+            f"<b>Заказ: {html.escape(order.title)}</b>\n\n"
+            f"<b>Описание:</b>\n{html.escape(order.description)}\n\n"
+            f"<b>Заказчик:</b> {html.escape(order.full_name)} (@{order.username})"
         )
         
         if order.photo_id:
@@ -397,19 +614,15 @@ async def show_next_order(message_or_call: types.Message | types.CallbackQuery,
         else:
             await message.answer(text, reply_markup=kb.get_job_search_keyboard(order.order_id))
     else:
-        async with async_session() as session:
-            await session.execute(delete(viewed_orders).where(viewed_orders.c.viewer_id == user_id))
-            await session.commit()
-        async with async_session() as session:
-
-            fresh_query = query.where(orders.c.order_id.notin_([])) 
-            result = await session.execute(fresh_query)
-            order = result.fetchone()
-
-        if order:
+        if order_feed.has_orders_for(user_id):
+            async with async_session() as session:
+                await session.execute(delete(viewed_orders).where(viewed_orders.c.viewer_id == user_id))
+                await session.commit()
+            seen.clear()
             await message.answer("Вы просмотрели все новые заказы. Показываю их заново.")
             await show_next_order(message_or_call, state) # Рекурсивный вызов
         else:
+            order_feed.forget_seen(user_id)
             await state.clear()
             await message.answer("На данный момент активных заказов нет. Загляните позже!", reply_markup=kb.get_main_menu_keyboard())
 
@@ -418,10 +631,11 @@ async def apply_for_job(call: types.CallbackQuery, state: FSMContext):
     order_id = int(call.data.split('_')[1])
     worker = await get_user(call.from_user.id)
     
-    async with async_session() as session:
-
-        result = await session.execute(select(orders).where(orders.c.order_id == order_id))
-        order = result.fetchone()
+    order = order_feed.get(order_id)
+    if not order:
+        async with read_session() as session:
+            result = await session.execute(order_by_id_query(order_id))
+            order = result.fetchone()
 
     if not order or not worker:
         await call.answer("Произошла ошибка, заказ или профиль не найден.", show_alert=True)
@@ -432,12 +646,16 @@ async def apply_for_job(call: types.CallbackQuery, state: FSMContext):
         profile_text = format_user_profile(worker)
         await bot.send_message(
             order.employer_id,
-            f"✉️ <b>Новый отклик на ваш заказ «{order.title}»!</b>\n\n"
+            f"✉️ <b>Новый отклик на ваш заказ «{html.escape(order.title)}»!</b>\n\n"
             f"Профиль исполнителя:\n{profile_text}"
         )
+        async with async_session() as session:
+            await session.execute(insert(applications).values(order_id=order_id, worker_id=worker.user_id))
+            await session.commit()
+        order_stats.record_application(order_id)
         await call.answer("✅ Ваш отклик успешно отправлен заказчику!", show_alert=True)
     except Exception as e:
-        logger.error(f"Не удалось отправить отклик от {worker.user_id} на заказ {order_id}: {e}")
+        logger.error("Не удалось отправить отклик от %s на заказ %s: %s", worker.user_id, order_id, e)
         await call.answer("Не удалось отправить отклик. Возможно, заказчик заблокировал бота.", show_alert=True)
     
 
@@ -452,6 +670,7 @@ async def skip_job(call: types.CallbackQuery, state: FSMContext):
 @dp.callback_query(F.data == 'stop_search')
 async def stop_search(call: types.CallbackQuery, state: FSMContext):
     await state.clear()
+    order_feed.forget_seen(call.from_user.id)
     await call.message.delete()
     await call.message.answer("Поиск завершен.", reply_markup=kb.get_main_menu_keyboard())
 
@@ -463,8 +682,11 @@ async def close_order(call: types.CallbackQuery):
     order_id = int(call.data.split('_')[2])
     async with async_session() as session:
         stmt = update(orders).where(and_(orders.c.order_id == order_id, orders.c.employer_id == call.from_user.id)).values(status='closed')
-        await session.execute(stmt)
+        result = await session.execute(stmt)
         await session.commit()
+    mark_write(call.from_user.id)
+    if result.rowcount:
+        order_feed.discard(order_id)
     await call.message.edit_text(f"Заказ #{order_id} был закрыт. Он больше не будет отображаться в поиске.")
     await call.answer()
 
@@ -473,8 +695,11 @@ async def reopen_order(call: types.CallbackQuery):
     order_id = int(call.data.split('_')[2])
     async with async_session() as session:
         stmt = update(orders).where(and_(orders.c.order_id == order_id, orders.c.employer_id == call.from_user.id)).values(status='open')
-        await session.execute(stmt)
+        result = await session.execute(stmt)
         await session.commit()
+    mark_write(call.from_user.id)
+    if result.rowcount:
+        await order_feed.load_order(order_id)
     await call.message.edit_text(f"Заказ #{order_id} снова открыт и доступен для поиска.")
     await call.answer()
 
@@ -494,8 +719,11 @@ async def confirm_delete_order(call: types.CallbackQuery):
     async with async_session() as session:
 
         stmt = delete(orders).where(and_(orders.c.order_id == order_id, orders.c.employer_id == call.from_user.id))
-        await session.execute(stmt)
+        result = await session.execute(stmt)
         await session.commit()
+    mark_write(call.from_user.id)
+    if result.rowcount:
+        order_feed.discard(order_id)
     await call.message.edit_text(f"Заказ #{order_id} был полностью удален.")
     await call.answer("Заказ удален.")
 
@@ -534,6 +762,7 @@ async def handle_toggle_visibility(call: types.CallbackQuery):
             update(users).where(users.c.user_id == call.from_user.id).values(is_active=new_status)
         )
         await session.commit()
+    mark_write(call.from_user.id)
     
     await call.answer(f"Ваш профиль теперь {'виден' if new_status else 'скрыт'} в поиске.")
     
@@ -594,6 +823,7 @@ async def process_new_profile_value(message: types.Message, state: FSMContext):
             update(users).where(users.c.user_id == message.from_user.id).values({field: value})
         )
         await session.commit()
+    mark_write(message.from_user.id)
 
     await message.answer("✅ Данные успешно обновлены!", reply_markup=kb.get_main_menu_keyboard())
     
@@ -601,13 +831,27 @@ async def process_new_profile_value(message: types.Message, state: FSMContext):
     await handle_my_profile(message) 
 
 async def main():
+    log_listener = setup_logging()
     logger.info("Запуск бота...")
     await create_tables() 
     async with async_session() as session:
         await session.execute(delete(viewed_orders))
         await session.commit()
-    
-    await dp.start_polling(bot, skip_updates=True)
+
+    if Config.DB_REPLICA_URLS:
+        asyncio.create_task(monitor_replicas())
+    await order_feed.refresh()
+    asyncio.create_task(run_order_feed_refresher())
+    asyncio.create_task(order_stats.run_flusher())
+    asyncio.create_task(order_stats.run_reconciler())
+    asyncio.create_task(run_archiver())
+    await broadcast.resume_broadcasts(bot)
+
+    try:
+        await dp.start_polling(bot, skip_updates=True)
+    finally:
+        await order_stats.flush()
+        log_listener.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+
+from config import Config
+from database import async_session, users, broadcasts, select, update, insert
+
+
+logger = logging.getLogger(__name__)
+
+# broadcast_id -> задача, которая сейчас ведет рассылку
+running: Dict[int, asyncio.Task] = {}
+
+
+class RateLimiter:
+    """Выдает слоты на отправку не чаще rate в секунду; flood-ограничение ставит на паузу всех."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self.next_slot = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        # После сна слот проверяется заново: пока ждали, pause() мог отодвинуть его
+        while True:
+            async with self.lock:
+                now = time.monotonic()
+                if now >= self.next_slot:
+                    self.next_slot = now + self.interval
+                    return
+                delay = self.next_slot - now
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        self.next_slot = max(self.next_slot, time.monotonic() + seconds)
+
+
+# Один лимитер на все рассылки: возобновленные вместе не должны в сумме превысить BROADCAST_RATE
+limiter = RateLimiter(Config.BROADCAST_RATE)
+
+
+async def _send(bot: Bot, user_id: int, text: str) -> str:
+    """Отправляет одно сообщение. Возвращает 'sent', 'blocked' или 'failed'."""
+    attempt = 0
+    while attempt <= Config.BROADCAST_MAX_RETRIES:
+        await limiter.wait()
+        try:
+            await bot.send_message(user_id, text)
+            return 'sent'
+        except TelegramRetryAfter as e:
+            # Flood-лимит — не ошибка получателя: ждем и повторяем, не тратя попытку
+            logger.warning("Flood-лимит при рассылке, пауза %s с", e.retry_after)
+            limiter.pause(e.retry_after)
+        except TelegramForbiddenError:
+            return 'blocked'
+        except TelegramBadRequest as e:
+            # Чат удален или не найден — повтор не поможет
+            logger.warning("Рассылка: не удалось отправить %s: %s", user_id, e)
+            return 'failed'
+        except Exception as e:
+            logger.warning("Рассылка: ошибка при отправке %s (попытка %s): %s", user_id, attempt + 1, e)
+            await asyncio.sleep(2 ** attempt)
+            attempt += 1
+    return 'failed'
+
+
+async def run_broadcast(bot: Bot, broadcast_id: int):
+    """Ведет рассылку; при сбое помечает ее failed и сообщает админу, а не умирает молча."""
+    try:
+        await _run_broadcast(bot, broadcast_id)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.exception("Рассылка #%s прервана ошибкой: %s", broadcast_id, e)
+        try:
+            async with async_session() as session:
+                await session.execute(
+                    update(broadcasts)
+                    .where(broadcasts.c.broadcast_id == broadcast_id, broadcasts.c.status == 'running')
+                    .values(status='failed', finished_at=datetime.now())
+                )
+                await session.commit()
+        except Exception as db_error:
+            logger.error("Не удалось пометить рассылку #%s как failed: %s", broadcast_id, db_error)
+        await _notify_admin(bot, f"⚠️ Рассылка #{broadcast_id} прервана ошибкой: {e}")
+
+async def _notify_admin(bot: Bot, text: str):
+    if not Config.ADMIN_ID:
+        return
+    try:
+        await bot.send_message(Config.ADMIN_ID, text, parse_mode=None)
+    except Exception as e:
+        logger.error("Не удалось отправить админу отчет о рассылке: %s", e)
+
+async def _run_broadcast(bot: Bot, broadcast_id: int):
+    """Ведет рассылку с последнего чекпоинта до конца таблицы users."""
+    async with async_session() as session:
+        result = await session.execute(select(broadcasts).where(broadcasts.c.broadcast_id == broadcast_id))
+        broadcast = result.fetchone()
+    if not broadcast or broadcast.status != 'running':
+        return
+
+    last_user_id = broadcast.last_user_id
+    logger.info("Рассылка #%s: старт с user_id > %s", broadcast_id, last_user_id, extra={'category': 'broadcast'})
+
+    while True:
+        async with async_session() as session:
+            result = await session.execute(
+                select(users.c.user_id)
+                .where(users.c.user_id > last_user_id)
+                .order_by(users.c.user_id)
+                .limit(Config.BROADCAST_BATCH)
+            )
+            recipients = [row[0] for row in result]
+        if not recipients:
+            break
+
+        # Чекпоинт после каждой параллельной пачки: при перезапуске повторно уйдет не больше одной пачки
+        for start in range(0, len(recipients), Config.BROADCAST_CONCURRENCY):
+            chunk = recipients[start:start + Config.BROADCAST_CONCURRENCY]
+            outcomes = await asyncio.gather(*(_send(bot, user_id, broadcast.text) for user_id in chunk))
+            blocked_ids = [user_id for user_id, outcome in zip(chunk, outcomes) if outcome == 'blocked']
+            last_user_id = chunk[-1]
+
+            async with async_session() as session:
+                if blocked_ids:
+                    await session.execute(update(users).where(users.c.user_id.in_(blocked_ids)).values(is_active=False))
+                await session.execute(
+                    update(broadcasts)
+                    .where(broadcasts.c.broadcast_id == broadcast_id)
+                    .values(last_user_id=last_user_id,
+                            sent=broadcasts.c.sent + outcomes.count('sent'),
+                            failed=broadcasts.c.failed + outcomes.count('failed'),
+                            blocked=broadcasts.c.blocked + len(blocked_ids))
+                )
+                await session.commit()
+
+    async with async_session() as session:
+        await session.execute(
+            update(broadcasts)
+            .where(broadcasts.c.broadcast_id == broadcast_id, broadcasts.c.status == 'running')
+            .values(status='done', finished_at=datetime.now())
+        )
+        await session.commit()
+        result = await session.execute(select(broadcasts).where(broadcasts.c.broadcast_id == broadcast_id))
+        broadcast = result.fetchone()
+
+    logger.info("Рассылка #%s завершена: отправлено %s, ошибок %s, заблокировали бота %s",
+                broadcast_id, broadcast.sent, broadcast.failed, broadcast.blocked, extra={'category': 'broadcast'})
+    await _notify_admin(
+        bot,
+        f"📣 Рассылка #{broadcast_id} завершена.\n\n"
+        f"Отправлено: {broadcast.sent}\nОшибок: {broadcast.failed}\nЗаблокировали бота: {broadcast.blocked}"
+    )
+
+
+def _start_task(bot: Bot, broadcast_id: int):
+    task = asyncio.create_task(run_broadcast(bot, broadcast_id))
+    running[broadcast_id] = task
+    task.add_done_callback(lambda _: running.pop(broadcast_id, None))
+
+async def start_broadcast(bot: Bot, text: str) -> int:
+    """Создает рассылку и запускает ее в фоне. Возвращает ее номер.
+
+    Сначала отправляет текст админу как превью: если Telegram не примет разметку,
+    TelegramBadRequest вылетит здесь, а не на каждом получателе.
+    """
+    await bot.send_message(Config.ADMIN_ID, text)
+    async with async_session() as session:
+        result = await session.execute(insert(broadcasts).values(text=text).returning(broadcasts.c.broadcast_id))
+        broadcast_id = result.scalar_one()
+        await session.commit()
+    _start_task(bot, broadcast_id)
+    return broadcast_id
+
+async def resume_broadcasts(bot: Bot):
+    """Продолжает рассылки, прерванные перезапуском бота."""
+    async with async_session() as session:
+        result = await session.execute(select(broadcasts.c.broadcast_id).where(broadcasts.c.status == 'running'))
+        broadcast_ids = [row[0] for row in result]
+    for broadcast_id in broadcast_ids:
+        logger.info("Возобновляю рассылку #%s", broadcast_id, extra={'category': 'broadcast'})
+        _start_task(bot, broadcast_id)
+
+async def cancel_broadcast(broadcast_id: int) -> bool:
+    """Останавливает рассылку. Возвращает False, если такой активной рассылки нет."""
+    async with async_session() as session:
+        result = await session.execute(
+            update(broadcasts)
+            .where(broadcasts.c.broadcast_id == broadcast_id, broadcasts.c.status == 'running')
+            .values(status='cancelled', finished_at=datetime.now())
+        )
+        await session.commit()
+    task = running.get(broadcast_id)
+    if task:
+        task.cancel()
+    return bool(result.rowcount)
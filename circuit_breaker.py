@@ -0,0 +1,145 @@
+import asyncio
+import html
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, Optional, Tuple, Type
+
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+STATE_LABELS = {
+    CLOSED: '🟢 работает',
+    OPEN: '🔴 отключен',
+    HALF_OPEN: '🟡 пробный запрос',
+}
+
+# Все созданные предохранители — для статуса у админа
+breakers: List['CircuitBreaker'] = []
+
+
+class CircuitOpenError(Exception):
+    """Вызов отклонен без обращения к сервису: предохранитель разомкнут."""
+
+
+class CircuitBreaker:
+    """Предохранитель для внешнего сервиса.
+
+    Считает долю ошибок по последним вызовам. Если она превышает порог, следующие
+    open_seconds секунд вызовы сразу падают с CircuitOpenError. Затем пропускается один
+    пробный вызов: успех замыкает цепь, ошибка снова размыкает.
+
+    Если задан failure_types, сбоем считаются только таймаут и эти исключения; остальные
+    (ошибка в самом запросе, а не недоступность сервиса) пробрасываются без учета.
+    """
+
+    def __init__(self, name: str, failure_rate: float = None, min_calls: int = None,
+                 window: int = None, open_seconds: float = None, call_timeout: float = None,
+                 failure_types: Optional[Tuple[Type[Exception], ...]] = None):
+        self.name = name
+        self.failure_types = failure_types
+        self.failure_rate = failure_rate if failure_rate is not None else Config.BREAKER_FAILURE_RATE
+        self.min_calls = min_calls or Config.BREAKER_MIN_CALLS
+        self.open_seconds = open_seconds if open_seconds is not None else Config.BREAKER_OPEN_SECONDS
+        self.call_timeout = call_timeout or Config.EXTERNAL_CALL_TIMEOUT
+        self._results = deque(maxlen=window or Config.BREAKER_WINDOW)
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self._probe_in_flight = False
+        self._listeners: List[Callable[['CircuitBreaker', str, str], Awaitable]] = []
+        breakers.append(self)
+
+    def add_listener(self, listener: Callable[['CircuitBreaker', str, str], Awaitable]):
+        """Подписывает корутину listener(breaker, old_state, new_state) на смену состояния."""
+        self._listeners.append(listener)
+
+    @property
+    def failures(self) -> int:
+        return self._results.count(False)
+
+    @property
+    def calls(self) -> int:
+        return len(self._results)
+
+    def _set_state(self, new_state: str):
+        old_state, self.state = self.state, new_state
+        if old_state == new_state:
+            return
+        logger.warning("Предохранитель '%s': %s -> %s", self.name, old_state, new_state)
+        for listener in self._listeners:
+            asyncio.get_running_loop().create_task(listener(self, old_state, new_state))
+
+    def _before_call(self):
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name}: сервис временно отключен")
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name}: идет пробный запрос")
+            self._probe_in_flight = True
+
+    def _on_success(self):
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            self._results.clear()
+            self._set_state(CLOSED)
+        self._results.append(True)
+
+    def _on_failure(self, error: Exception):
+        self.last_error = f"{type(error).__name__}: {error}"
+        self._results.append(False)
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            self._open()
+        elif self.state == CLOSED and self.calls >= self.min_calls and self.failures / self.calls >= self.failure_rate:
+            self._open()
+
+    def _open(self):
+        if self.state == CLOSED:
+            # Начало нового инцидента
+            self.rejected = 0
+        self.opened_at = time.monotonic()
+        self._set_state(OPEN)
+
+    def _is_outage(self, error: Exception) -> bool:
+        if self.failure_types is None:
+            return True
+        return isinstance(error, (asyncio.TimeoutError,) + tuple(self.failure_types))
+
+    async def call(self, func: Callable[..., Awaitable], *args, **kwargs):
+        """Вызывает func(*args, **kwargs) с таймаутом через предохранитель."""
+        self._before_call()
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), self.call_timeout)
+        except asyncio.CancelledError:
+            self._probe_in_flight = False
+            raise
+        except Exception as e:
+            if self._is_outage(e):
+                self._on_failure(e)
+            else:
+                # Сервис ответил — пробный вызов состоялся, но о его здоровье ничего не говорит
+                self._probe_in_flight = False
+            raise
+        self._on_success()
+        return result
+
+    def describe(self) -> str:
+        """Краткое описание состояния для админа."""
+        text = f"<b>{self.name}:</b> {STATE_LABELS[self.state]}, ошибок {self.failures}/{self.calls}"
+        if self.state != CLOSED:
+            text += f", отключен {int(time.monotonic() - self.opened_at)} с назад, отклонено вызовов: {self.rejected}"
+        if self.last_error:
+            text += f"\nПоследняя ошибка: {html.escape(self.last_error)}"
+        return text
@@ -8,14 +8,65 @@ class Config:
     BOT_TOKEN = os.getenv("BOT_TOKEN")
 
     DB_URL = os.getenv("DB_URL")
+    # Реплики только для чтения, через запятую. Если пусто — всё идет в основную БД
+    DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+    # Допустимое отставание реплики (сек). Столько же после записи пользователь читает с основной БД
+    DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", 5))
+    DB_REPLICA_CHECK_INTERVAL = int(os.getenv("DB_REPLICA_CHECK_INTERVAL", 10))
+    # Таймаут подключения и запроса к реплике (сек): мертвая реплика не должна держать чтение
+    DB_REPLICA_TIMEOUT = float(os.getenv("DB_REPLICA_TIMEOUT", 3))
 
     NETWORKING_GROUP_ID = int(os.getenv("NETWORKING_GROUP_ID", 0))
     NETWORKING_TOPIC_ID = int(os.getenv("NETWORKING_TOPIC_ID", 0))
     ORDERS_TOPIC_ID = int(os.getenv("ORDERS_TOPIC_ID", 0))
     ORDER_LIFETIME_HOURS = 48
+    # Как часто полностью перечитывать снимок открытых заказов для ленты (сек)
+    ORDER_SNAPSHOT_REFRESH_INTERVAL = int(os.getenv("ORDER_SNAPSHOT_REFRESH_INTERVAL", 60))
+    # История просмотров ленты в памяти: сколько держать после последнего обращения (сек) и для скольких пользователей
+    FEED_SEEN_TTL = int(os.getenv("FEED_SEEN_TTL", 1800))
+    FEED_SEEN_MAX_USERS = int(os.getenv("FEED_SEEN_MAX_USERS", 10000))
+    # Как часто сбрасывать накопленные счетчики просмотров/откликов в order_stats (сек)
+    ORDER_STATS_FLUSH_INTERVAL = int(os.getenv("ORDER_STATS_FLUSH_INTERVAL", 30))
+    # Как часто пересчитывать order_stats по исходным таблицам (сек) и размер порции
+    ORDER_STATS_RECONCILE_INTERVAL = int(os.getenv("ORDER_STATS_RECONCILE_INTERVAL", 24 * 3600))
+    ORDER_STATS_RECONCILE_CHUNK = int(os.getenv("ORDER_STATS_RECONCILE_CHUNK", 1000))
+    # Архив: заказы старше стольких дней переносятся в orders_archive пачками по ORDER_ARCHIVE_BATCH
+    ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", 30))
+    ORDER_ARCHIVE_BATCH = int(os.getenv("ORDER_ARCHIVE_BATCH", 500))
+    ORDER_ARCHIVE_INTERVAL = int(os.getenv("ORDER_ARCHIVE_INTERVAL", 3600))
+    ORDER_ARCHIVE_PAGE_SIZE = int(os.getenv("ORDER_ARCHIVE_PAGE_SIZE", 5))
+    # Секционировать viewed_orders по дням (только для новой БД: существующую таблицу не переделать create_all)
+    VIEWED_ORDERS_PARTITIONED = os.getenv("VIEWED_ORDERS_PARTITIONED", "0").lower() in ("1", "true", "yes")
+    # Поиск исполнителей: размер страницы и сколько секунд держать результаты в кэше
+    WORKER_SEARCH_PAGE_SIZE = int(os.getenv("WORKER_SEARCH_PAGE_SIZE", 5))
+    WORKER_SEARCH_CACHE_TTL = int(os.getenv("WORKER_SEARCH_CACHE_TTL", 60))
+    WORKER_SEARCH_CACHE_SIZE = int(os.getenv("WORKER_SEARCH_CACHE_SIZE", 500))
     # --- Настройки Google Sheets ---
     # Имя JSON-файла с ключами для доступа к Google API (должен лежать рядом с ботом)
     GOOGLE_CREDS_JSON = os.getenv("GOOGLE_CREDS_JSON", "credentials.json")    
     # Название твоей Google таблицы
     GOOGLE_SHEET_NAME = os.getenv("GOOGLE_SHEET_NAME")
     ADMIN_ID = int(os.getenv("ADMIN_ID", 0))
+    # --- Предохранители для Google Sheets и публикаций в группу ---
+    # Размыкать при такой доле ошибок среди последних BREAKER_WINDOW вызовов (но не раньше BREAKER_MIN_CALLS)
+    BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", 0.5))
+    BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", 4))
+    BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", 20))
+    # Сколько секунд отклонять вызовы, прежде чем пропустить пробный
+    BREAKER_OPEN_SECONDS = int(os.getenv("BREAKER_OPEN_SECONDS", 60))
+    EXTERNAL_CALL_TIMEOUT = int(os.getenv("EXTERNAL_CALL_TIMEOUT", 10))
+    # Одинаковые алерты админу — не чаще раза в столько секунд
+    ALERT_DEDUP_SECONDS = int(os.getenv("ALERT_DEDUP_SECONDS", 600))
+    # --- Рассылки ---
+    # Не больше стольких сообщений в секунду (лимит Telegram — около 30)
+    BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", 25))
+    BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 10))
+    # Сколько получателей читать из БД за раз; после каждой порции сохраняется чекпоинт
+    BROADCAST_BATCH = int(os.getenv("BROADCAST_BATCH", 100))
+    BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", 3))
+    # --- Логирование ---
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # JSON-строки вместо обычного текста (удобно для сборщиков логов)
+    LOG_JSON = os.getenv("LOG_JSON", "0").lower() in ("1", "true", "yes")
+    # Доля INFO-записей по категориям; пустая строка отключает сэмплирование
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "feed=0.1,handler=0.05")
@@ -1,9 +1,13 @@
 import asyncio
+import itertools
+import logging
+import time
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 
 from sqlalchemy import (Table, Column, Integer, BigInteger, String, Text,
-                        Boolean, TIMESTAMP, ForeignKey, MetaData, select, update, delete, and_, insert)
+                        Boolean, TIMESTAMP, ForeignKey, Index, MetaData, select, update, delete, and_, or_, insert, text)
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
@@ -13,6 +17,60 @@ engine = create_async_engine(Config.DB_URL)
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 metadata = MetaData()
 
+logger = logging.getLogger(__name__)
+
+replica_engines = [
+    create_async_engine(url, pool_pre_ping=True,
+                        connect_args={'timeout': Config.DB_REPLICA_TIMEOUT, 'command_timeout': Config.DB_REPLICA_TIMEOUT})
+    for url in Config.DB_REPLICA_URLS
+]
+healthy_replicas = set(range(len(replica_engines)))
+_replica_counter = itertools.count()
+_recent_writes: Dict[int, float] = {}
+
+# NULL, если реплика не получает WAL (обрыв с основной БД): совпадение receive и replay
+# тогда ничего не значит. Статус приемника виден роли с pg_monitor или pg_read_all_stats.
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE "
+    "WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def _is_connection_error(error: Exception) -> bool:
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated
+    # Ошибки подключения asyncpg приходят как есть, без обертки SQLAlchemy
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+
+class ReplicaSession(AsyncSession):
+    """Сессия чтения с реплики: при обрыве связи исключает реплику и повторяет запрос на основной БД."""
+
+    def __init__(self, *args, replica_index: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica_index = replica_index
+
+    async def execute(self, statement, *args, **kwargs):
+        try:
+            return await super().execute(statement, *args, **kwargs)
+        except Exception as e:
+            if not _is_connection_error(e):
+                raise
+            if self.replica_index in healthy_replicas:
+                logger.warning("Реплика #%s исключена из чтения: %s", self.replica_index, e)
+                healthy_replicas.discard(self.replica_index)
+            await self.close()
+            async with async_session() as session:
+                return await session.execute(statement, *args, **kwargs)
+
+
+replica_sessions = [
+    sessionmaker(e, expire_on_commit=False, class_=ReplicaSession, replica_index=index)
+    for index, e in enumerate(replica_engines)
+]
+
 users = Table(
     'users', metadata,
     Column('user_id', BigInteger, primary_key=True, unique=True),
@@ -26,6 +84,18 @@ users = Table(
     Column('created_at', TIMESTAMP, default=datetime.now)
 )
 
+# Триграммные индексы для поиска исполнителей: частичные, только по видимым в поиске
+WORKER_SEARCH_ROLES = ('worker', 'both')
+WORKER_SEARCH_PREDICATE = and_(users.c.is_active.is_(True), users.c.role.in_(WORKER_SEARCH_ROLES))
+ix_users_search_sphere = Index(
+    'ix_users_search_sphere_trgm', users.c.sphere,
+    postgresql_using='gin', postgresql_ops={'sphere': 'gin_trgm_ops'}, postgresql_where=WORKER_SEARCH_PREDICATE
+)
+ix_users_search_bio = Index(
+    'ix_users_search_bio_trgm', users.c.bio,
+    postgresql_using='gin', postgresql_ops={'bio': 'gin_trgm_ops'}, postgresql_where=WORKER_SEARCH_PREDICATE
+)
+
 orders = Table(
     'orders', metadata,
     Column('order_id', Integer, primary_key=True, autoincrement=True),
@@ -37,6 +107,12 @@ orders = Table(
     Column('created_at', TIMESTAMP, default=datetime.now)
 )
 
+# Горячие индексы: лента читает только открытые заказы, "Мои заказы" — по заказчику.
+# Старые заказы уезжают в orders_archive (см. archive.py), поэтому индексы остаются маленькими
+ix_orders_open_created_at = Index('ix_orders_open_created_at', orders.c.created_at,
+                                  postgresql_where=orders.c.status == 'open')
+ix_orders_employer_created_at = Index('ix_orders_employer_created_at', orders.c.employer_id, orders.c.created_at)
+
 applications = Table(
     'applications', metadata,
     Column('application_id', Integer, primary_key=True, autoincrement=True),
@@ -46,19 +122,203 @@ applications = Table(
     Column('status', String(50), default='pending') 
 )
 
+# При VIEWED_ORDERS_PARTITIONED таблица секционируется по дням: просмотры старше срока жизни
+# заказа не нужны ленте, и их секции просто удаляются (см. archive.py)
 viewed_orders = Table(
     'viewed_orders', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
     Column('viewer_id', BigInteger, ForeignKey('users.user_id', ondelete="CASCADE")),
     Column('order_id', Integer, ForeignKey('orders.order_id', ondelete="CASCADE")),
-    Column('viewed_at', TIMESTAMP, default=datetime.now)
+    Column('viewed_at', TIMESTAMP, default=datetime.now,
+           primary_key=Config.VIEWED_ORDERS_PARTITIONED, nullable=False),
+    **({'postgresql_partition_by': 'RANGE (viewed_at)'} if Config.VIEWED_ORDERS_PARTITIONED else {})
+)
+ix_viewed_orders_viewer_id = Index('ix_viewed_orders_viewer_id', viewed_orders.c.viewer_id)
+
+# Счетчики вовлеченности по заказам. Обновляются пачками дельт (см. order_stats.py),
+# чтобы "Мои заказы" не считали COUNT(*) по viewed_orders/applications
+order_stats = Table(
+    'order_stats', metadata,
+    Column('order_id', Integer, ForeignKey('orders.order_id', ondelete="CASCADE"), primary_key=True),
+    Column('views', Integer, nullable=False, default=0),
+    Column('unique_viewers', Integer, nullable=False, default=0),
+    Column('applications', Integer, nullable=False, default=0),
+    Column('last_activity_at', TIMESTAMP)
 )
 
+# Кто хоть раз видел заказ. В отличие от viewed_orders (история ленты, которая сбрасывается)
+# не очищается, поэтому по ней считаются уникальные просмотры
+order_viewers = Table(
+    'order_viewers', metadata,
+    Column('order_id', Integer, ForeignKey('orders.order_id', ondelete="CASCADE"), primary_key=True),
+    Column('viewer_id', BigInteger, ForeignKey('users.user_id', ondelete="CASCADE"), primary_key=True)
+)
+
+# Холодный архив закрытых и истекших заказов. Без внешних ключей на orders: строки туда
+# переносятся пачками и из orders удаляются вместе с просмотрами, откликами и статистикой
+orders_archive = Table(
+    'orders_archive', metadata,
+    Column('order_id', Integer, primary_key=True, autoincrement=False),
+    Column('employer_id', BigInteger, index=True),
+    Column('title', String(255), nullable=False),
+    Column('description', Text, nullable=False),
+    Column('photo_id', String(255)),
+    Column('status', String(50)),
+    Column('created_at', TIMESTAMP),
+    Column('views', Integer, nullable=False, default=0),
+    Column('unique_viewers', Integer, nullable=False, default=0),
+    Column('applications', Integer, nullable=False, default=0),
+    Column('archived_at', TIMESTAMP, default=datetime.now)
+)
+
+applications_archive = Table(
+    'applications_archive', metadata,
+    Column('application_id', Integer, primary_key=True, autoincrement=False),
+    Column('order_id', Integer, index=True),
+    Column('worker_id', BigInteger),
+    Column('created_at', TIMESTAMP),
+    Column('status', String(50))
+)
+
+# Рассылки админа. last_user_id — чекпоинт курсора по users.user_id: после перезапуска
+# рассылка продолжается с него, а не с начала
+broadcasts = Table(
+    'broadcasts', metadata,
+    Column('broadcast_id', Integer, primary_key=True, autoincrement=True),
+    Column('text', Text, nullable=False),
+    Column('status', String(50), nullable=False, default='running'),
+    Column('last_user_id', BigInteger, nullable=False, default=0),
+    Column('sent', Integer, nullable=False, default=0),
+    Column('failed', Integer, nullable=False, default=0),
+    Column('blocked', Integer, nullable=False, default=0),
+    Column('created_at', TIMESTAMP, default=datetime.now),
+    Column('finished_at', TIMESTAMP)
+)
+
+# Индексы на таблицах, которые могли существовать до их появления: create_all пропускает
+# существующие таблицы вместе с индексами, поэтому такие индексы создаются отдельно
+ADDED_INDEXES = [ix_users_search_sphere, ix_users_search_bio,
+                 ix_orders_open_created_at, ix_orders_employer_created_at, ix_viewed_orders_viewer_id]
+
+# --- Горячие запросы: их строят обработчики бота и их же меряет benchmarks ---
+
+def user_by_id_query(user_id: int):
+    return select(users).where(users.c.user_id == user_id)
+
+def feed_orders_query():
+    """Заказы вместе с именем и ником заказчика — в таком виде они лежат в снимке ленты."""
+    return (
+        select(orders, users.c.full_name, users.c.username)
+        .join(users, orders.c.employer_id == users.c.user_id)
+    )
+
+def open_feed_orders_query():
+    """Открытые заказы за последние ORDER_LIFETIME_HOURS в порядке снимка ленты."""
+    time_limit = datetime.now() - timedelta(hours=Config.ORDER_LIFETIME_HOURS)
+    return (
+        feed_orders_query()
+        .where(and_(orders.c.status == 'open', orders.c.created_at >= time_limit))
+        .order_by(orders.c.created_at, orders.c.order_id)
+    )
+
+def viewed_order_ids_query(user_id: int):
+    return select(viewed_orders.c.order_id).where(viewed_orders.c.viewer_id == user_id)
+
+def employer_orders_query(employer_id: int):
+    """Заказы заказчика со статистикой, новые сверху."""
+    return (
+        select(orders,
+               order_stats.c.views, order_stats.c.unique_viewers,
+               order_stats.c.applications, order_stats.c.last_activity_at)
+        .outerjoin(order_stats, orders.c.order_id == order_stats.c.order_id)
+        .where(orders.c.employer_id == employer_id)
+        .order_by(orders.c.created_at.desc())
+    )
+
+def order_by_id_query(order_id: int):
+    return select(orders).where(orders.c.order_id == order_id)
+
+def worker_search_query(query_text: str, after_id: int = 0):
+    """Страница видимых исполнителей по сфере и описанию плюс одна строка — признак продолжения."""
+    escaped = query_text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = f"%{escaped}%"
+    # Условия повторяют предикат частичных индексов, иначе планировщик их не возьмет
+    return (
+        select(users)
+        .where(
+            and_(
+                users.c.is_active.is_(True),
+                users.c.role.in_(WORKER_SEARCH_ROLES),
+                or_(users.c.sphere.ilike(pattern, escape='\\'), users.c.bio.ilike(pattern, escape='\\')),
+                users.c.user_id > after_id
+            )
+        )
+        .order_by(users.c.user_id)
+        .limit(Config.WORKER_SEARCH_PAGE_SIZE + 1)
+    )
+
 async def create_tables():
     """Создает все таблицы в базе данных, если их еще нет."""
     async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(metadata.create_all)
-    print("Таблицы успешно созданы или уже существуют.")
+        for index in ADDED_INDEXES:
+            await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+    if Config.VIEWED_ORDERS_PARTITIONED:
+        from archive import ensure_viewed_partitions
+        await ensure_viewed_partitions()
+    logger.info("Таблицы успешно созданы или уже существуют.")
+
+
+def mark_write(user_id: int):
+    """Запоминает, что пользователь только что писал в БД: его чтения пока идут с основной БД."""
+    # Без реплик все чтения и так идут с основной БД, а чистить словарь было бы некому
+    if not replica_engines:
+        return
+    _recent_writes[user_id] = time.monotonic()
+
+def read_session(user_id: Optional[int] = None) -> AsyncSession:
+    """Возвращает сессию для чтения: здоровую реплику по кругу или основную БД."""
+    if user_id is not None:
+        written_at = _recent_writes.get(user_id)
+        if written_at and time.monotonic() - written_at < Config.DB_REPLICA_MAX_LAG_SECONDS:
+            return async_session()
+
+    available = sorted(healthy_replicas)
+    if not available:
+        return async_session()
+    index = available[next(_replica_counter) % len(available)]
+    return replica_sessions[index]()
+
+async def check_replicas():
+    """Проверяет доступность и отставание реплик, обновляя список здоровых."""
+    for index, replica in enumerate(replica_engines):
+        lag = None
+        try:
+            async with replica.connect() as conn:
+                lag = await conn.scalar(REPLICA_LAG_QUERY)
+            is_healthy = lag is not None and lag <= Config.DB_REPLICA_MAX_LAG_SECONDS
+        except Exception as e:
+            logger.warning("Реплика #%s недоступна: %s", index, e)
+            is_healthy = False
+
+        if is_healthy and index not in healthy_replicas:
+            logger.info("Реплика #%s снова в строю.", index, extra={'category': 'replicas'})
+            healthy_replicas.add(index)
+        elif not is_healthy and index in healthy_replicas:
+            logger.warning("Реплика #%s исключена из чтения (отставание: %s).", index,
+                           lag if lag is not None else "репликация не идет")
+            healthy_replicas.discard(index)
+
+    threshold = time.monotonic() - Config.DB_REPLICA_MAX_LAG_SECONDS
+    for user_id in [uid for uid, ts in _recent_writes.items() if ts < threshold]:
+        _recent_writes.pop(user_id, None)
+
+async def monitor_replicas():
+    """Фоновая задача: периодически проверяет реплики."""
+    while True:
+        await check_replicas()
+        await asyncio.sleep(Config.DB_REPLICA_CHECK_INTERVAL)
 
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 import gspread_asyncio
 from google.oauth2.service_account import Credentials
 from config import Config
+from circuit_breaker import CircuitBreaker
 import logging
 
 
@@ -15,67 +16,67 @@ def get_creds():
 
 agcm = gspread_asyncio.AsyncioGspreadClientManager(get_creds)
 
+# Пока Google лежит, вызовы сразу падают с CircuitOpenError, а не ждут таймаута
+sheets_breaker = CircuitBreaker("Google Sheets")
+
+async def _open_sheets():
+    agc = await agcm.authorize()
+    spreadsheet = await agc.open(Config.GOOGLE_SHEET_NAME)
+    users_sheet = await spreadsheet.worksheet("Пользователи")
+    orders_sheet = await spreadsheet.worksheet("Заказы")
+    return users_sheet, orders_sheet
+
 async def get_sheets():
-    """Асинхронно подключается к Google и возвращает объекты листов."""
-    try:
-        agc = await agcm.authorize()
-        spreadsheet = await agc.open(Config.GOOGLE_SHEET_NAME)
-        users_sheet = await spreadsheet.worksheet("Пользователи")
-        orders_sheet = await spreadsheet.worksheet("Заказы")
-        return users_sheet, orders_sheet
-    except Exception as e:
-        logger.error(f"Не удалось подключиться к Google Sheets или найти листы 'Пользователи'/'Заказы': {e}")
-        return None, None
+    """Асинхронно подключается к Google и возвращает объекты листов. Ошибки пробрасывает."""
+    return await sheets_breaker.call(_open_sheets)
 
 async def add_user_to_sheet(user_data: dict):
     """Добавляет нового пользователя в Google Таблицу."""
-    users_sheet, _ = await get_sheets()
-    if not users_sheet:
-        return
+    # Подключение и запись — одна операция для предохранителя: иначе запись, которая всегда
+    # падает, дает лишь 50% ошибок на фоне успешных подключений и может не разомкнуть цепь
+    await sheets_breaker.call(_add_user_row, user_data)
 
-    try:
-        header = await users_sheet.row_values(1)
-        if not header:
-            headers = ["ID Пользователя", "Username", "Полное имя", "Роль", "Сфера", "О себе", "Портфолио", "Дата регистрации"]
-            await users_sheet.append_row(headers)
+async def _add_user_row(user_data: dict):
+    users_sheet, _ = await _open_sheets()
+    header = await users_sheet.row_values(1)
+    if not header:
+        headers = ["ID Пользователя", "Username", "Полное имя", "Роль", "Сфера", "О себе", "Портфолио", "Дата регистрации"]
+        await users_sheet.append_row(headers)
 
-        row = [
-            user_data.get('user_id'),
-            user_data.get('username'),
-            user_data.get('full_name'),
-            user_data.get('role'),
-            user_data.get('sphere'),
-            user_data.get('bio'),
-            user_data.get('portfolio', '-'),
-            user_data.get('created_at').strftime('%Y-%m-%d %H:%M:%S')
-        ]
-        await users_sheet.append_row(row)
-        logger.info(f"Пользователь {user_data.get('user_id')} успешно добавлен в Google Sheets.")
-    except Exception as e:
-        logger.error(f"Не удалось добавить пользователя {user_data.get('user_id')} в таблицу: {e}")
+    row = [
+        user_data.get('user_id'),
+        user_data.get('username'),
+        user_data.get('full_name'),
+        user_data.get('role'),
+        user_data.get('sphere'),
+        user_data.get('bio'),
+        user_data.get('portfolio', '-'),
+        user_data.get('created_at').strftime('%Y-%m-%d %H:%M:%S')
+    ]
+    await users_sheet.append_row(row)
+    logger.info("Пользователь %s успешно добавлен в Google Sheets.", user_data.get('user_id'),
+                extra={'category': 'gsheets'})
 
 async def add_order_to_sheet(order_data: dict, employer_username: str):
     """Добавляет новый заказ в Google Таблицу."""
-    _, orders_sheet = await get_sheets()
-    if not orders_sheet:
-        return
+    await sheets_breaker.call(_add_order_row, order_data, employer_username)
 
-    try:
-        header = await orders_sheet.row_values(1)
-        if not header:
-            headers = ["ID Заказа", "ID Заказчика", "Username Заказчика", "Название", "Описание", "Дата создания", "Статус"]
-            await orders_sheet.append_row(headers)
+async def _add_order_row(order_data: dict, employer_username: str):
+    _, orders_sheet = await _open_sheets()
+    header = await orders_sheet.row_values(1)
+    if not header:
+        headers = ["ID Заказа", "ID Заказчика", "Username Заказчика", "Название", "Описание", "Дата создания", "Статус"]
+        await orders_sheet.append_row(headers)
 
-        row = [
-            order_data.get('order_id'),
-            order_data.get('employer_id'),
-            employer_username,
-            order_data.get('title'),
-            order_data.get('description'),
-            order_data.get('created_at').strftime('%Y-%m-%d %H:%M:%S'),
-            order_data.get('status', 'open')
-        ]
-        await orders_sheet.append_row(row)
-        logger.info(f"Заказ {order_data.get('order_id')} успешно добавлен в Google Sheets.")
-    except Exception as e:
-        logger.error(f"Не удалось добавить заказ {order_data.get('order_id')} в таблицу: {e}")
+    row = [
+        order_data.get('order_id'),
+        order_data.get('employer_id'),
+        employer_username,
+        order_data.get('title'),
+        order_data.get('description'),
+        order_data.get('created_at').strftime('%Y-%m-%d %H:%M:%S'),
+        order_data.get('status', 'open')
+    ]
+    await orders_sheet.append_row(row)
+    logger.info("Заказ %s успешно добавлен в Google Sheets.", order_data.get('order_id'),
+                extra={'category': 'gsheets'})
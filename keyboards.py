@@ -5,7 +5,8 @@ def get_main_menu_keyboard():
     return ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="👤 Мой профиль"), KeyboardButton(text="🔍 Найти работу")],
-            [KeyboardButton(text="📦 Мои заказы"), KeyboardButton(text="➕ Создать заказ")]
+            [KeyboardButton(text="📦 Мои заказы"), KeyboardButton(text="➕ Создать заказ")],
+            [KeyboardButton(text="🔎 Найти исполнителя")]
         ],
         resize_keyboard=True
     )
@@ -57,6 +58,13 @@ def get_job_search_keyboard(order_id: int):
         ]
     )
 
+def get_worker_search_keyboard(has_more: bool):
+    buttons = []
+    if has_more:
+        buttons.append([InlineKeyboardButton(text="➡️ Показать еще", callback_data="workers_next")])
+    buttons.append([InlineKeyboardButton(text="🚪 Закончить поиск", callback_data="stop_worker_search")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
 def get_order_management_keyboard(order_id: int, is_closed: bool):
     buttons = []
     if is_closed:
@@ -69,6 +77,12 @@ def get_order_management_keyboard(order_id: int, is_closed: bool):
     return InlineKeyboardMarkup(inline_keyboard=[buttons])
 
 
+def get_archive_keyboard(before_order_id: int):
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="🗄 Архив заказов", callback_data=f"orders_archive_{before_order_id}")]]
+    )
+
+
 def get_confirm_delete_keyboard(order_id: int):
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -0,0 +1,117 @@
+import contextvars
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict
+
+from aiogram import BaseMiddleware
+
+from config import Config
+
+
+# Контекст текущего апдейта: update_id, user_id, handler. Подмешивается в каждую запись лога
+log_context: contextvars.ContextVar[dict] = contextvars.ContextVar('log_context', default={})
+
+PLAIN_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+JSON_FIELDS = ('category', 'update_id', 'user_id', 'handler', 'duration_ms')
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет в запись поля из контекста апдейта."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю INFO/DEBUG записей своей категории. Предупреждения и ошибки не трогает."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rates.get(getattr(record, 'category', None))
+        return rate is None or random.random() < rate
+
+class JsonFormatter(logging.Formatter):
+    """Пишет запись одной JSON-строкой."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in JSON_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def parse_sample_rates(raw: str) -> Dict[str, float]:
+    """Разбирает строку вида 'feed=0.1,gsheets=0.5'."""
+    rates = {}
+    for item in raw.split(','):
+        if '=' not in item:
+            continue
+        category, rate = item.split('=', 1)
+        rates[category.strip()] = float(rate)
+    return rates
+
+def setup_logging() -> QueueListener:
+    """Настраивает логирование через очередь: хендлеры только кладут записи, вывод — в отдельном потоке."""
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if Config.LOG_JSON else logging.Formatter(PLAIN_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # Фильтры работают в потоке вызова: контекст доступен, а отброшенные записи даже не форматируются
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(Config.LOG_SAMPLE_RATES)))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(Config.LOG_LEVEL)
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+class LoggingMiddleware(BaseMiddleware):
+    """Заполняет контекст лога для апдейта и пишет время обработки."""
+
+    def __init__(self):
+        self.logger = logging.getLogger('bot.handlers')
+
+    async def __call__(self, handler, event, data):
+        update = data.get('event_update')
+        handler_object = data.get('handler')
+        user = data.get('event_from_user')
+        context = {
+            'update_id': update.update_id if update else None,
+            'user_id': user.id if user else None,
+            'handler': handler_object.callback.__name__ if handler_object else None,
+        }
+        token = log_context.set(context)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.logger.info("Апдейт обработан за %s мс", duration_ms,
+                             extra={'category': 'handler', 'duration_ms': duration_ms})
+            log_context.reset(token)
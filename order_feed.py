@@ -0,0 +1,147 @@
+import asyncio
+import bisect
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import Config
+from database import async_session, orders, feed_orders_query, open_feed_orders_query, viewed_order_ids_query
+
+
+logger = logging.getLogger(__name__)
+
+
+def _sort_key(order):
+    return order.created_at, order.order_id
+
+
+class OrderSnapshot:
+    """Снимок открытых заказов в памяти, отсортированный по дате создания.
+
+    Лента читает только его; в БД идет лишь запись просмотра. Снимок патчится при
+    создании/закрытии/открытии/удалении заказа и периодически перечитывается целиком.
+    """
+
+    def __init__(self):
+        self._orders: List = []
+        self._by_id: Dict[int, object] = {}
+        # user_id -> (время последнего обращения, просмотренные заказы); порядок — от давних обращений к свежим
+        self._seen: "OrderedDict[int, Tuple[float, Set[int]]]" = OrderedDict()
+        # id заказов, пропатченных во время идущего refresh; None, если refresh не идет
+        self._patched: Optional[Set[int]] = None
+
+    def __len__(self):
+        return len(self._orders)
+
+    def get(self, order_id: int):
+        return self._by_id.get(order_id)
+
+    def _insert(self, order):
+        self._remove(order.order_id)
+        bisect.insort(self._orders, order, key=_sort_key)
+        self._by_id[order.order_id] = order
+
+    def _remove(self, order_id: int):
+        if self._patched is not None:
+            self._patched.add(order_id)
+        order = self._by_id.pop(order_id, None)
+        if order is None:
+            return
+        index = bisect.bisect_left(self._orders, _sort_key(order), key=_sort_key)
+        if index < len(self._orders) and self._orders[index].order_id == order_id:
+            del self._orders[index]
+
+    async def refresh(self):
+        """Полностью перечитывает открытые заказы за последние ORDER_LIFETIME_HOURS.
+
+        Читает с основной БД: реплика может еще не видеть только что созданный заказ. Заказы,
+        пропатченные, пока шел запрос, берутся из памяти — их состояние новее прочитанного.
+        """
+        self._patched = set()
+        try:
+            async with async_session() as session:
+                result = await session.execute(open_feed_orders_query())
+                rows = result.fetchall()
+            patched = self._patched
+        finally:
+            self._patched = None
+
+        if patched:
+            rows = [row for row in rows if row.order_id not in patched]
+            rows.extend(self._by_id[order_id] for order_id in patched if order_id in self._by_id)
+            rows.sort(key=_sort_key)
+        self._orders = rows
+        self._by_id = {row.order_id: row for row in rows}
+        logger.info("Снимок ленты обновлен: %s открытых заказов.", len(rows), extra={'category': 'feed'})
+
+    async def load_order(self, order_id: int):
+        """Подтягивает заказ с основной БД после создания или повторного открытия."""
+        async with async_session() as session:
+            result = await session.execute(feed_orders_query().where(orders.c.order_id == order_id))
+            order = result.fetchone()
+        if order and order.status == 'open':
+            self._insert(order)
+        else:
+            self._remove(order_id)
+
+    def discard(self, order_id: int):
+        """Убирает закрытый или удаленный заказ из снимка."""
+        self._remove(order_id)
+
+    async def get_seen(self, user_id: int) -> Set[int]:
+        """Возвращает просмотренные пользователем заказы; из БД читает только первый раз.
+
+        Истории, к которым не обращались FEED_SEEN_TTL секунд, и самые давние сверх
+        FEED_SEEN_MAX_USERS вытесняются: пользователь мог просто бросить ленту.
+        """
+        now = time.monotonic()
+        entry = self._seen.pop(user_id, None)
+        self._evict_seen(now)
+        if entry is None:
+            async with async_session() as session:
+                result = await session.execute(viewed_order_ids_query(user_id))
+                seen = {row[0] for row in result}
+        else:
+            seen = entry[1]
+        self._seen[user_id] = (now, seen)
+        return seen
+
+    def _evict_seen(self, now: float):
+        while self._seen:
+            accessed_at, _ = next(iter(self._seen.values()))
+            if len(self._seen) < Config.FEED_SEEN_MAX_USERS and now - accessed_at < Config.FEED_SEEN_TTL:
+                break
+            self._seen.popitem(last=False)
+
+    def forget_seen(self, user_id: int):
+        """Освобождает память, когда пользователь закончил поиск."""
+        self._seen.pop(user_id, None)
+
+    def next_for(self, user_id: int, seen: Set[int]) -> Optional[object]:
+        """Самый свежий открытый заказ, который пользователь еще не видел."""
+        time_limit = datetime.now() - timedelta(hours=Config.ORDER_LIFETIME_HOURS)
+        for order in reversed(self._orders):
+            if order.created_at < time_limit:
+                break
+            if order.employer_id != user_id and order.order_id not in seen:
+                return order
+        return None
+
+    def has_orders_for(self, user_id: int) -> bool:
+        """Есть ли вообще актуальные чужие заказы (без учета просмотров)."""
+        return self.next_for(user_id, set()) is not None
+
+
+snapshot = OrderSnapshot()
+
+
+async def run_refresher():
+    """Фоновая задача: периодически сверяет снимок с БД."""
+    while True:
+        await asyncio.sleep(Config.ORDER_SNAPSHOT_REFRESH_INTERVAL)
+        try:
+            await snapshot.refresh()
+        except Exception as e:
+            logger.error("Не удалось обновить снимок ленты: %s", e)
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from config import Config
+from database import async_session, orders, applications, viewed_orders, order_stats, order_viewers, select
+
+
+logger = logging.getLogger(__name__)
+
+# Дельты, накопленные с последнего сброса: order_id -> {'views', 'unique_viewers', 'applications', 'last_activity_at'}
+_pending: Dict[int, dict] = {}
+# flush и порция сверки не должны идти одновременно: иначе одна и та же дельта
+# окажется и в подсчете сверки, и в прибавке flush
+_lock = asyncio.Lock()
+
+
+def _delta(order_id: int) -> dict:
+    delta = _pending.get(order_id)
+    if delta is None:
+        delta = _pending[order_id] = {'views': 0, 'unique_viewers': 0, 'applications': 0, 'last_activity_at': None}
+    return delta
+
+def record_view(order_id: int, unique: bool = True):
+    """Учитывает показ заказа в ленте."""
+    delta = _delta(order_id)
+    delta['views'] += 1
+    if unique:
+        delta['unique_viewers'] += 1
+    delta['last_activity_at'] = datetime.now()
+
+def record_application(order_id: int):
+    """Учитывает отклик на заказ."""
+    delta = _delta(order_id)
+    delta['applications'] += 1
+    delta['last_activity_at'] = datetime.now()
+
+def pending_for(order_id: int) -> dict:
+    """Возвращает еще не сброшенные в БД дельты заказа (или пустые)."""
+    return _pending.get(order_id) or {'views': 0, 'unique_viewers': 0, 'applications': 0, 'last_activity_at': None}
+
+
+async def flush():
+    """Сбрасывает накопленные дельты в order_stats одним upsert-запросом."""
+    async with _lock:
+        await _flush()
+
+async def _flush():
+    global _pending
+    if not _pending:
+        return
+    batch, _pending = _pending, {}
+
+    try:
+        async with async_session() as session:
+            # Заказ могли удалить, пока дельта лежала в памяти — такие пропускаем
+            existing = await session.execute(select(orders.c.order_id).where(orders.c.order_id.in_(list(batch))))
+            rows = [{'order_id': order_id, **batch[order_id]} for (order_id,) in existing]
+            if rows:
+                stmt = pg_insert(order_stats)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[order_stats.c.order_id],
+                    set_={
+                        'views': order_stats.c.views + stmt.excluded.views,
+                        'unique_viewers': order_stats.c.unique_viewers + stmt.excluded.unique_viewers,
+                        'applications': order_stats.c.applications + stmt.excluded.applications,
+                        'last_activity_at': func.greatest(order_stats.c.last_activity_at, stmt.excluded.last_activity_at),
+                    }
+                )
+                await session.execute(stmt, rows)
+                await session.commit()
+    except Exception as e:
+        logger.error("Не удалось сохранить статистику заказов: %s", e)
+        # Возвращаем дельты обратно, чтобы не потерять их до следующей попытки
+        _merge_back(batch)
+
+def _merge_back(batch: Dict[int, dict]):
+    for order_id, delta in batch.items():
+        merged = _delta(order_id)
+        for key in ('views', 'unique_viewers', 'applications'):
+            merged[key] += delta[key]
+        if merged['last_activity_at'] is None or (delta['last_activity_at'] and delta['last_activity_at'] > merged['last_activity_at']):
+            merged['last_activity_at'] = delta['last_activity_at']
+
+
+def _take_counters(order_ids: Iterable[int]) -> Dict[int, dict]:
+    """Забирает из _pending счетчики заказов; время активности остается для flush."""
+    taken = {}
+    for order_id in order_ids:
+        delta = _pending.get(order_id)
+        if delta:
+            taken[order_id] = {key: delta[key] for key in ('views', 'unique_viewers', 'applications')}
+            taken[order_id]['last_activity_at'] = None
+            delta['views'] = delta['unique_viewers'] = delta['applications'] = 0
+    return taken
+
+async def _reconcile_chunk(order_ids: Iterable[int]):
+    async with _lock:
+        await _reconcile_locked(list(order_ids))
+
+async def _reconcile_locked(order_ids: List[int]):
+    async with async_session() as session:
+        view_rows = await session.execute(
+            select(viewed_orders.c.order_id,
+                   func.count().label('views'),
+                   func.max(viewed_orders.c.viewed_at).label('last_view'))
+            .where(viewed_orders.c.order_id.in_(order_ids))
+            .group_by(viewed_orders.c.order_id)
+        )
+        views = {row.order_id: row for row in view_rows}
+        application_rows = await session.execute(
+            select(applications.c.order_id,
+                   func.count().label('applications'),
+                   func.max(applications.c.created_at).label('last_application'))
+            .where(applications.c.order_id.in_(order_ids))
+            .group_by(applications.c.order_id)
+        )
+        applied = {row.order_id: row for row in application_rows}
+        viewer_rows = await session.execute(
+            select(order_viewers.c.order_id, func.count().label('unique_viewers'))
+            .where(order_viewers.c.order_id.in_(order_ids))
+            .group_by(order_viewers.c.order_id)
+        )
+        unique_viewers = {row.order_id: row.unique_viewers for row in viewer_rows}
+        # Сразу после подсчета, без await, забираем накопленные дельты: строки пишутся в БД
+        # до record_*(), так что они уже вошли в подсчет выше, и flush не должен прибавить
+        # их второй раз. Возможный недосчет за время запросов исправит следующая сверка
+        taken = _take_counters(order_ids)
+
+        try:
+            stored_rows = await session.execute(
+                select(order_stats.c.order_id, order_stats.c.views).where(order_stats.c.order_id.in_(order_ids))
+            )
+            stored_views = {row.order_id: row.views for row in stored_rows}
+
+            rows = []
+            for order_id in order_ids:
+                view, application = views.get(order_id), applied.get(order_id)
+                activity = [t for t in (view and view.last_view, application and application.last_application) if t]
+                # viewed_orders периодически очищается (сброс ленты, перезапуск), поэтому по ней
+                # просмотры можно только добрать до сохраненных плюс еще не сброшенных
+                pending_views = taken.get(order_id, {}).get('views', 0)
+                rows.append({
+                    'order_id': order_id,
+                    'views': max(stored_views.get(order_id, 0) + pending_views, view.views if view else 0),
+                    'unique_viewers': unique_viewers.get(order_id, 0),
+                    'applications': application.applications if application else 0,
+                    'last_activity_at': max(activity) if activity else None,
+                })
+
+            # Отклики и зрители хранятся полностью, поэтому берутся как есть
+            stmt = pg_insert(order_stats)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[order_stats.c.order_id],
+                set_={
+                    'views': stmt.excluded.views,
+                    'unique_viewers': stmt.excluded.unique_viewers,
+                    'applications': stmt.excluded.applications,
+                    'last_activity_at': func.greatest(order_stats.c.last_activity_at, stmt.excluded.last_activity_at),
+                }
+            )
+            await session.execute(stmt, rows)
+            await session.commit()
+        except Exception:
+            # Подсчет не сохранился — дельты снова нужны flush
+            _merge_back(taken)
+            raise
+
+async def reconcile(chunk_size: int = None):
+    """Пересчитывает order_stats по исходным таблицам порциями по order_id."""
+    chunk_size = chunk_size or Config.ORDER_STATS_RECONCILE_CHUNK
+    await flush()
+    last_id = 0
+    total = 0
+    while True:
+        async with async_session() as session:
+            result = await session.execute(
+                select(orders.c.order_id)
+                .where(orders.c.order_id > last_id)
+                .order_by(orders.c.order_id)
+                .limit(chunk_size)
+            )
+            order_ids = [row[0] for row in result]
+        if not order_ids:
+            break
+        await _reconcile_chunk(order_ids)
+        total += len(order_ids)
+        last_id = order_ids[-1]
+        # Отдаем управление циклу событий между порциями
+        await asyncio.sleep(0)
+    logger.info("Статистика заказов пересчитана: %s заказов.", total, extra={'category': 'stats'})
+
+
+async def run_flusher():
+    """Фоновая задача: периодически сбрасывает дельты в БД."""
+    while True:
+        await asyncio.sleep(Config.ORDER_STATS_FLUSH_INTERVAL)
+        await flush()
+
+async def run_reconciler():
+    """Фоновая задача: периодически сверяет order_stats с исходными таблицами."""
+    while True:
+        await asyncio.sleep(Config.ORDER_STATS_RECONCILE_INTERVAL)
+        try:
+            await reconcile()
+        except Exception as e:
+            logger.error("Не удалось пересчитать статистику заказов: %s", e)